@@ -1,41 +1,379 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
 import os
 import json
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.tracing import tracer
 from app.core.config import settings
-from app.models.models import ReportBatch, StructuredReport, Template
-from app.schemas.schemas import ReportBatchCreate, ReportBatchResponse, StructuredReportResponse
-from app.tasks.report_tasks import process_report_task
+from app.models.models import ReportBatch, StructuredReport, Template, User
+from app.schemas.schemas import (
+    ReportBatchBulkDelete,
+    ReportBatchCreate,
+    ReportBatchResponse,
+    StructuredReportResponse,
+    UsageRollup,
+)
+from app.services.admission import AdmissionRejected, check_admission
+from app.services.batch_cache import (
+    batch_etag,
+    cache_batch,
+    cache_batch_list,
+    etag_matches,
+    get_cached_batch,
+    get_cached_batch_list,
+    invalidate_batch_list,
+    invalidate_batches,
+)
+from app.services.near_duplicates import content_key, find_near_duplicates
+from app.services.provider_batches import uses_provider_batches
+from app.services.report_storage import (
+    delete_batches,
+    ensure_partition,
+    read_archived_reports,
+    remove_batch_files,
+)
+from app.services.text_dictionaries import compress_report_texts
+from app.services.usage import USAGE_GROUPS, get_usage_rollup
+from app.tasks.export_tasks import export_batch_task
+from app.tasks.provider_batch_tasks import submit_provider_batch_task
+from app.tasks.report_tasks import process_report_task, update_batch_progress
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# Report columns returned when the report text isn't requested
+REPORT_SUMMARY_COLUMNS = [
+    column for column in StructuredReport.__table__.columns
+    if column.key != "original_text"
+]
+
+# Statuses of near-duplicate representatives whose result is still to come
+IN_FLIGHT_STATUSES = ("pending", "processing", "submitted")
+
 
 @router.post("/batches", response_model=ReportBatchResponse, status_code=201)
 async def create_batch(
     name: str = Form(...),
     template_id: int = Form(...),
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    owner_id: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new batch and upload JSON file(s) containing arrays of report texts.
     Expected JSON format: ["report 1 text...", "report 2 text...", ...]
+    Returns 429 with a Retry-After header if the workers are saturated or
+    the owner has too many reports in flight, and 404 if owner_id isn't an
+    existing user. owner_id is supplied by the client and not authenticated,
+    so the per-owner quota is advisory: it only applies to clients that send
+    it, and a client can omit it or send another id. The global queue and
+    outstanding-report limits always apply. With AI_BATCH_MODE_ENABLED,
+    large uploads are submitted to the provider's batch API instead of the
+    workers and are not subject to admission control.
     """
     # Validate template exists
-    template = db.query(Template).filter(Template.id == template_id).first()
+    template = await db.get(Template, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    # Collect all reports from all JSON files
-    all_reports = []
+    # owner_id references a user, so an unknown id would fail the insert
+    if owner_id is not None and not await db.get(User, owner_id):
+        raise HTTPException(status_code=404, detail="Owner not found")
 
     # Create upload directory
     upload_dir = os.path.join(settings.UPLOAD_DIR, "temp")
     os.makedirs(upload_dir, exist_ok=True)
 
+    # Read and validate the uploaded files
+    with tracer.start_as_current_span("create_batch.parse_upload") as span:
+        all_reports = await _read_upload_files(files)
+        span.set_attribute("reports.count", len(all_reports))
+
+    if not all_reports:
+        raise HTTPException(
+            status_code=400,
+            detail="No reports found in uploaded files."
+        )
+
+    use_provider_batch = uses_provider_batches(len(all_reports))
+
+    # Reject the upload if it would overload the workers
+    if settings.ADMISSION_CONTROL_ENABLED and not use_provider_batch:
+        try:
+            with tracer.start_as_current_span("create_batch.admission"):
+                await check_admission(db, len(all_reports), owner_id)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=e.reason,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+    # Create batch with correct total_reports count
+    batch = ReportBatch(
+        name=name,
+        template_id=template_id,
+        owner_id=owner_id,
+        total_reports=len(all_reports),
+        status="pending"
+    )
+    db.add(batch)
+    await db.commit()
+    await db.refresh(batch)
+
+    # The batch's reports go into its partition of structured_reports
+    await run_in_threadpool(ensure_partition, batch.id)
+
+    # Create batch-specific upload directory
+    batch_upload_dir = os.path.join(settings.UPLOAD_DIR, str(batch.id))
+    os.makedirs(batch_upload_dir, exist_ok=True)
+
+    # Group near-duplicate reports so only one per group hits the LLM
+    if settings.NEAR_DUPLICATE_ENABLED:
+        with tracer.start_as_current_span("create_batch.near_duplicates"):
+            keys = await run_in_threadpool(
+                lambda: [content_key(report_data["text"]) for report_data in all_reports]
+            )
+            clusters = find_near_duplicates(keys)
+    else:
+        keys = [None] * len(all_reports)
+        clusters = [None] * len(all_reports)
+
+    # Report text is stored compressed with the template's dictionary
+    with tracer.start_as_current_span("create_batch.compress_text"):
+        compressed_texts = await run_in_threadpool(
+            compress_report_texts,
+            template_id,
+            [report_data["text"] for report_data in all_reports]
+        )
+
+    # Create all report records in one transaction
+    with tracer.start_as_current_span("create_batch.insert_reports"):
+        reports = [
+            StructuredReport(
+                batch_id=batch.id,
+                template_id=template_id,
+                original_text=compressed_text,
+                text_length=len(report_data["text"]),
+                filename=f"{report_data['source_file']}_report_{idx + 1}",
+                content_key=key,
+                status="pending"
+            )
+            for idx, (report_data, compressed_text, key) in enumerate(zip(all_reports, compressed_texts, keys))
+        ]
+        # Matching reports of earlier uploads (locked until the commit)
+        representatives = {}
+        if settings.NEAR_DUPLICATE_ENABLED:
+            representatives = await db.run_sync(_find_representatives, template_id, keys)
+        db.add_all(reports)
+        await db.flush()
+
+        for report, cluster in zip(reports, clusters):
+            representative = representatives.get(report.content_key)
+            if representative is not None and representative.status == "completed":
+                report.structured_data = representative.structured_data
+                report.confidence_score = representative.confidence_score
+                report.is_propagated = True
+                report.status = "completed"
+                report.processed_at = datetime.utcnow()
+                report.duplicate_of_id = representative.id
+            elif representative is not None:
+                report.duplicate_of_id = representative.id
+            elif cluster is not None:
+                report.duplicate_of_id = reports[cluster].id
+
+        finished = False
+        if any(report.status == "completed" for report in reports):
+            await db.flush()
+            finished = await db.run_sync(update_batch_progress, batch.id)
+        await db.commit()
+    await invalidate_batch_list()
+
+    # Queue processing tasks; near-duplicates wait for their representative.
+    # Publishing to the broker is blocking I/O, so keep it off the event loop.
+    with tracer.start_as_current_span("create_batch.queue_tasks"):
+        if use_provider_batch:
+            await run_in_threadpool(submit_provider_batch_task.delay, batch.id)
+        else:
+            await run_in_threadpool(
+                _queue_reports,
+                batch.id,
+                [
+                    report.id for report in reports
+                    if report.status == "pending" and report.duplicate_of_id is None
+                ]
+            )
+        if finished and settings.ANALYTICS_EXPORT_ENABLED:
+            await run_in_threadpool(export_batch_task.delay, batch.id)
+
+    return batch
+
+
+@router.get("/batches", response_model=List[ReportBatchResponse])
+async def get_batches(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all report batches (304 if unchanged since the given ETag)"""
+    cached, version = await get_cached_batch_list(skip, limit)
+    if cached:
+        data, etag = cached
+    else:
+        result = await db.execute(select(ReportBatch).offset(skip).limit(limit))
+        data = [
+            ReportBatchResponse.model_validate(batch).model_dump(mode="json")
+            for batch in result.scalars().all()
+        ]
+        etag = batch_etag(data)
+        await cache_batch_list(version, skip, limit, data, etag)
+
+    return _conditional_response(response, data, etag, if_none_match)
+
+
+@router.get("/batches/{batch_id}", response_model=ReportBatchResponse)
+async def get_batch(
+    batch_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific batch by ID (304 if unchanged since the given ETag)"""
+    cached = await get_cached_batch(batch_id)
+    if cached:
+        data, etag = cached
+    else:
+        batch = await db.get(ReportBatch, batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        data = ReportBatchResponse.model_validate(batch).model_dump(mode="json")
+        etag = batch_etag([data])
+        await cache_batch(batch_id, data, etag)
+
+    return _conditional_response(response, data, etag, if_none_match)
+
+
+@router.post("/batches/bulk-delete")
+async def bulk_delete_batches(
+    request: ReportBatchBulkDelete,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Delete batches with all their reports. Reports are removed by dropping
+    their partitions where possible instead of row by row. Batches that are
+    still being processed can't be deleted.
+    """
+    result = await db.execute(select(ReportBatch).filter(ReportBatch.id.in_(request.batch_ids)))
+    batches = result.scalars().all()
+
+    in_progress = [batch.id for batch in batches if batch.status in ("pending", "processing")]
+    if in_progress:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Batches still processing: {', '.join(map(str, in_progress))}"
+        )
+
+    batch_ids = [batch.id for batch in batches]
+    paths = await db.run_sync(delete_batches, batch_ids)
+    await db.commit()
+    # Files are only removed once the rows referring to them are gone
+    await run_in_threadpool(remove_batch_files, paths)
+    await run_in_threadpool(invalidate_batches, batch_ids)
+
+    return {
+        "deleted": batch_ids,
+        "not_found": sorted(set(request.batch_ids) - set(batch_ids))
+    }
+
+
+@router.get("/batches/{batch_id}/reports", response_model=List[StructuredReportResponse])
+async def get_batch_reports(
+    batch_id: int,
+    include_text: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get all reports in a batch (read from the archive for archived batches).
+    The report text is only loaded with include_text=true; GET /{report_id}
+    always includes it.
+    """
+    batch = await db.get(ReportBatch, batch_id)
+    if batch and batch.archive_path:
+        return await run_in_threadpool(read_archived_reports, batch.archive_path, include_text)
+
+    if include_text:
+        result = await db.execute(
+            select(StructuredReport)
+            .options(undefer(StructuredReport.original_text))
+            .filter(StructuredReport.batch_id == batch_id)
+        )
+        return result.scalars().all()
+
+    result = await db.execute(
+        select(*REPORT_SUMMARY_COLUMNS).filter(StructuredReport.batch_id == batch_id)
+    )
+    return result.mappings().all()
+
+
+@router.get("/usage", response_model=List[UsageRollup])
+async def get_usage(
+    group_by: str = "batch",
+    batch_id: Optional[int] = None,
+    template_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Token usage, cost and latency per batch, template or model, most
+    expensive first. Reports of archived batches are not included.
+    """
+    if group_by not in USAGE_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by must be one of: {', '.join(USAGE_GROUPS)}"
+        )
+    return await get_usage_rollup(db, group_by, batch_id=batch_id, template_id=template_id)
+
+
+@router.get("/{report_id}", response_model=StructuredReportResponse)
+async def get_report(
+    report_id: int,
+    batch_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a specific structured report. Passing the report's batch_id lets
+    the database look in that batch's partition only.
+    """
+    query = select(StructuredReport).options(
+        undefer(StructuredReport.original_text)
+    ).where(StructuredReport.id == report_id)
+    if batch_id is not None:
+        query = query.where(StructuredReport.batch_id == batch_id)
+    report = (await db.execute(query)).scalar_one_or_none()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+
+def _conditional_response(response: Response, data, etag: str, if_none_match: Optional[str]):
+    """Return 304 if the client's ETag is current, otherwise the data with its ETag"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return data
+
+
+async def _read_upload_files(files: List[UploadFile]) -> List[dict]:
+    """Collect all reports from all JSON files, validating each one"""
+    all_reports = []
+
     # Process each JSON file
     for file in files:
         # Validate file extension
@@ -84,81 +422,36 @@ async def create_batch(
                 detail=f"Invalid JSON in {file.filename}: {str(e)}"
             )
 
-    if not all_reports:
-        raise HTTPException(
-            status_code=400,
-            detail="No reports found in uploaded files."
-        )
+    return all_reports
 
-    # Create batch with correct total_reports count
-    batch = ReportBatch(
-        name=name,
-        template_id=template_id,
-        total_reports=len(all_reports),
-        status="pending"
-    )
-    db.add(batch)
-    db.commit()
-    db.refresh(batch)
 
-    # Create batch-specific upload directory
-    batch_upload_dir = os.path.join(settings.UPLOAD_DIR, str(batch.id))
-    os.makedirs(batch_upload_dir, exist_ok=True)
+def _queue_reports(batch_id: int, report_ids: List[int]):
+    """Publish processing tasks for the given reports of a batch"""
+    for report_id in report_ids:
+        process_report_task.delay(report_id, batch_id)
 
-    # Create report records and queue processing
-    for idx, report_data in enumerate(all_reports):
-        report = StructuredReport(
-            batch_id=batch.id,
-            template_id=template_id,
-            original_text=report_data["text"],
-            filename=f"{report_data['source_file']}_report_{idx + 1}",
-            status="pending"
-        )
-        db.add(report)
-        db.commit()
-        db.refresh(report)
-
-        # Queue processing task
-        process_report_task.delay(report.id)
-
-    return batch
-
-
-@router.get("/batches", response_model=List[ReportBatchResponse])
-def get_batches(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
-    """Get all report batches"""
-    batches = db.query(ReportBatch).offset(skip).limit(limit).all()
-    return batches
-
-
-@router.get("/batches/{batch_id}", response_model=ReportBatchResponse)
-def get_batch(batch_id: int, db: Session = Depends(get_db)):
-    """Get a specific batch by ID"""
-    batch = db.query(ReportBatch).filter(ReportBatch.id == batch_id).first()
-    if not batch:
-        raise HTTPException(status_code=404, detail="Batch not found")
-    return batch
-
-
-@router.get("/batches/{batch_id}/reports", response_model=List[StructuredReportResponse])
-def get_batch_reports(batch_id: int, db: Session = Depends(get_db)):
-    """Get all reports in a batch"""
-    reports = db.query(StructuredReport).filter(
-        StructuredReport.batch_id == batch_id
-    ).all()
-    return reports
 
+def _find_representatives(db: Session, template_id: int, keys: List[str]) -> Dict[str, StructuredReport]:
+    """
+    Reports of earlier uploads of a template to group new reports with, by
+    content key: a completed report, whose result can be copied, or else a
+    representative still being processed. The rows are locked until the
+    upload commits, so a representative can't finish (and propagate its
+    result) before the reports pointing at it are committed.
+    """
+    rows = db.query(StructuredReport).filter(
+        StructuredReport.template_id == template_id,
+        StructuredReport.content_key.in_(set(keys)),
+        or_(
+            StructuredReport.status == "completed",
+            StructuredReport.status.in_(IN_FLIGHT_STATUSES) & StructuredReport.duplicate_of_id.is_(None)
+        )
+    ).order_by(StructuredReport.id).with_for_update().all()
 
-@router.get("/{report_id}", response_model=StructuredReportResponse)
-def get_report(report_id: int, db: Session = Depends(get_db)):
-    """Get a specific structured report"""
-    report = db.query(StructuredReport).filter(
-        StructuredReport.id == report_id
-    ).first()
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    return report
+    representatives: Dict[str, StructuredReport] = {}
+    for report in rows:
+        current = representatives.get(report.content_key)
+        # Prefer a result that can be copied right away
+        if current is None or (report.status == "completed" and current.status != "completed"):
+            representatives[report.content_key] = report
+    return representatives
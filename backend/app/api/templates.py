@@ -1,81 +1,95 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.models import Template
 from app.schemas.schemas import TemplateCreate, TemplateResponse, TemplateUpdate
+from app.tasks.export_tasks import export_template_task
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
 
 @router.get("/", response_model=List[TemplateResponse])
-def get_templates(
+async def get_templates(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all templates (public + user's private templates)"""
-    templates = db.query(Template).filter(
-        Template.is_public == True
-    ).offset(skip).limit(limit).all()
-    return templates
+    result = await db.execute(
+        select(Template).filter(Template.is_public == True).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 
 @router.get("/{template_id}", response_model=TemplateResponse)
-def get_template(template_id: int, db: Session = Depends(get_db)):
+async def get_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific template by ID"""
-    template = db.query(Template).filter(Template.id == template_id).first()
+    template = await db.get(Template, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return template
 
 
 @router.post("/", response_model=TemplateResponse, status_code=status.HTTP_201_CREATED)
-def create_template(
+async def create_template(
     template: TemplateCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new custom template"""
     db_template = Template(**template.dict())
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 
 @router.put("/{template_id}", response_model=TemplateResponse)
-def update_template(
+async def update_template(
     template_id: int,
     template_update: TemplateUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an existing template"""
-    db_template = db.query(Template).filter(Template.id == template_id).first()
+    db_template = await db.get(Template, template_id)
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
-    
+
     update_data = template_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_template, key, value)
-    
-    db.commit()
-    db.refresh(db_template)
+
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 
+@router.post("/{template_id}/export", status_code=status.HTTP_202_ACCEPTED)
+async def export_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Queue a rebuild of the template's Parquet analytics partitions"""
+    db_template = await db.get(Template, template_id)
+    if not db_template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    await run_in_threadpool(export_template_task.delay, template_id)
+    return {"template_id": template_id, "status": "queued"}
+
+
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_template(template_id: int, db: Session = Depends(get_db)):
+async def delete_template(template_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a template"""
-    db_template = db.query(Template).filter(Template.id == template_id).first()
+    db_template = await db.get(Template, template_id)
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
-    
+
     if db_template.is_public:
         raise HTTPException(
-            status_code=403, 
+            status_code=403,
             detail="Cannot delete public templates"
         )
-    
-    db.delete(db_template)
-    db.commit()
+
+    await db.delete(db_template)
+    await db.commit()
     return None
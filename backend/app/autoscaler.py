@@ -0,0 +1,66 @@
+"""
+Worker pool autoscaling driven by broker queue depth and LLM latency.
+
+Celery's default autoscaler sizes the pool by the number of tasks the
+worker has already reserved, which with a prefetch multiplier of 1 says
+little about the backlog. This autoscaler instead looks at the Redis queue
+and the recent per-report LLM latency, and asks for the number of
+processes needed to drain the backlog within
+CELERY_AUTOSCALE_TARGET_DRAIN_SECONDS (Little's law), clamped to the
+configured min/max.
+"""
+from typing import Optional
+import math
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+LATENCY_SAMPLES_KEY = "worker:llm_latency_ms"
+LATENCY_SAMPLES_MAX = 200
+
+
+def record_llm_latency(latency_ms: int) -> None:
+    """Store a per-report LLM latency sample for the autoscaler"""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.lpush(LATENCY_SAMPLES_KEY, latency_ms)
+        pipe.ltrim(LATENCY_SAMPLES_KEY, 0, LATENCY_SAMPLES_MAX - 1)
+        pipe.execute()
+    except Exception:
+        # Metrics must never fail a task
+        pass
+
+
+def get_recent_llm_latency_ms() -> Optional[float]:
+    """Mean of the recent latency samples, or None if there are none"""
+    samples = redis_client.lrange(LATENCY_SAMPLES_KEY, 0, -1)
+    if not samples:
+        return None
+    return sum(int(sample) for sample in samples) / len(samples)
+
+
+def desired_concurrency(queue_depth: int, in_progress: int, latency_ms: float) -> int:
+    """Processes needed to finish the current backlog within the drain target"""
+    backlog = queue_depth + in_progress
+    return math.ceil(backlog * latency_ms / 1000 / settings.CELERY_AUTOSCALE_TARGET_DRAIN_SECONDS)
+
+
+class QueueDepthAutoscaler(Autoscaler):
+    _desired = 0
+
+    def _maybe_scale(self, req=None):
+        try:
+            queue_depth = redis_client.llen(self.worker.app.conf.task_default_queue)
+            latency_ms = get_recent_llm_latency_ms() or settings.CELERY_AUTOSCALE_DEFAULT_LATENCY_MS
+            self._desired = desired_concurrency(
+                queue_depth, len(state.active_requests), latency_ms
+            )
+        except Exception:
+            # Keep the current size if Redis is unavailable
+            self._desired = self.processes
+        return super()._maybe_scale(req)
+
+    @property
+    def qty(self):
+        return self._desired
@@ -13,4 +13,24 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    # Worker tuning for long, I/O-bound LLM tasks
+    worker_pool=settings.CELERY_WORKER_POOL,
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    worker_prefetch_multiplier=settings.CELERY_PREFETCH_MULTIPLIER,
+    task_acks_late=settings.CELERY_ACKS_LATE,
+    task_reject_on_worker_lost=settings.CELERY_ACKS_LATE,
+    worker_autoscaler='app.autoscaler:QueueDepthAutoscaler',
 )
+
+# Periodic tasks, run by `celery beat` (or a worker with CELERY_BEAT_ENABLED)
+celery_app.conf.beat_schedule = {}
+if settings.REPORT_ARCHIVE_ENABLED:
+    celery_app.conf.beat_schedule['archive-old-batches'] = {
+        'task': 'archive_old_batches',
+        'schedule': settings.REPORT_ARCHIVE_INTERVAL_SECONDS,
+    }
+if settings.AI_BATCH_MODE_ENABLED:
+    celery_app.conf.beat_schedule['poll-provider-batches'] = {
+        'task': 'poll_provider_batches',
+        'schedule': settings.AI_BATCH_POLL_INTERVAL_SECONDS,
+    }
@@ -1,5 +1,25 @@
 from app.celery_app import celery_app
-from app.tasks import report_tasks  # Import tasks to register them
+from app.core.config import settings
+from app.core.tracing import setup_tracing
+from app.tasks import report_tasks, export_tasks, archive_tasks, provider_batch_tasks  # Import tasks to register them
+
+setup_tracing("radstruct-worker")
 
 # This file is used to run the Celery worker
 # celery -A app.celery_worker worker --loglevel=info
+# or, to also apply the autoscaling settings from the config:
+# python -m app.celery_worker
+
+
+def worker_argv() -> list:
+    """Worker command line built from the settings"""
+    argv = ["worker", "--loglevel=info"]
+    if settings.CELERY_AUTOSCALE_ENABLED:
+        argv.append(f"--autoscale={settings.CELERY_AUTOSCALE_MAX},{settings.CELERY_AUTOSCALE_MIN}")
+    if settings.CELERY_BEAT_ENABLED:
+        argv.append("--beat")
+    return argv
+
+
+if __name__ == "__main__":
+    celery_app.worker_main(worker_argv())
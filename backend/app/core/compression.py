@@ -0,0 +1,114 @@
+"""
+Compressed storage of report text.
+
+StructuredReport.original_text is stored as a zstd frame (the CompressedText
+column type) and decompressed when the column is loaded. The column is
+deferred, so report queries only fetch and decompress the text where it is
+actually used.
+
+Reports of one template share most of their boilerplate, so uploads are
+compressed with a dictionary trained on reports of the same template (see
+app.services.text_dictionaries). Every frame records the id of its
+dictionary, which is looked up in the text_dictionaries table and cached
+per process when the frame is decompressed. Text bound without a
+dictionary is compressed plainly.
+
+Rows written before compression was introduced hold plain UTF-8 text (see
+the upgrade notes in the README) and are returned as they are.
+"""
+from typing import Any, Dict, Optional
+import threading
+import zstandard
+from sqlalchemy import LargeBinary, text
+from sqlalchemy.types import TypeDecorator
+from app.core.config import settings
+from app.core.database import engine
+
+# Every zstd frame starts with these bytes. "(" followed by 0xB5 isn't
+# valid UTF-8, so plain text can't be mistaken for a frame.
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+
+# zstd compressors and decompressors aren't thread-safe; each thread keeps
+# its own per dictionary so the dictionary is only loaded once
+_local = threading.local()
+
+
+def register_dictionary(dictionary: zstandard.ZstdCompressionDict) -> None:
+    _dictionaries[dictionary.dict_id()] = dictionary
+
+
+def get_dictionary(dict_id: int) -> zstandard.ZstdCompressionDict:
+    """Dictionary by zstd dictionary id, loaded from the database once per process"""
+    if dict_id not in _dictionaries:
+        with engine.connect() as conn:
+            data = conn.execute(
+                text("SELECT data FROM text_dictionaries WHERE dict_id = :dict_id"),
+                {"dict_id": dict_id}
+            ).scalar()
+        if data is None:
+            raise ValueError(f"Compression dictionary {dict_id} not found")
+        register_dictionary(zstandard.ZstdCompressionDict(data))
+    return _dictionaries[dict_id]
+
+
+def _compressor(dict_id: int) -> zstandard.ZstdCompressor:
+    compressors = _local.__dict__.setdefault("compressors", {})
+    if dict_id not in compressors:
+        compressors[dict_id] = zstandard.ZstdCompressor(
+            level=settings.REPORT_COMPRESSION_LEVEL,
+            dict_data=get_dictionary(dict_id) if dict_id else None
+        )
+    return compressors[dict_id]
+
+
+def _decompressor(dict_id: int) -> zstandard.ZstdDecompressor:
+    decompressors = _local.__dict__.setdefault("decompressors", {})
+    if dict_id not in decompressors:
+        decompressors[dict_id] = zstandard.ZstdDecompressor(
+            dict_data=get_dictionary(dict_id) if dict_id else None
+        )
+    return decompressors[dict_id]
+
+
+def compress_text(value: str, dict_id: int = 0) -> bytes:
+    """zstd frame of the text, using the given dictionary (0 for none)"""
+    return _compressor(dict_id).compress(value.encode("utf-8"))
+
+
+def decompress_text(frame: bytes) -> str:
+    dict_id = zstandard.get_frame_parameters(frame).dict_id
+    return _decompressor(dict_id).decompress(frame).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored as a zstd frame. Text values are compressed without a
+    dictionary; frames from compress_text are stored as they are.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if isinstance(value, str):
+            return compress_text(value)
+        return value
+
+    def result_processor(self, dialect, coltype):
+        # LargeBinary's own processor calls bytes() on every value, which
+        # fails on legacy text values, so values come here unprocessed
+        def process(value):
+            return self.process_result_value(value, dialect)
+        return process
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        # Legacy plain-text rows, in a text column or converted to bytes
+        if isinstance(value, str):
+            return value
+        value = bytes(value)
+        if value[:4] != ZSTD_MAGIC:
+            return value.decode("utf-8")
+        return decompress_text(value)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -15,18 +15,170 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL (asyncpg/aiosqlite) if not set
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a pooled connection
     
     # Redis
     REDIS_URL: str
     
     # AI Provider
-    AI_PROVIDER: Optional[str] = None  # "anthropic", "openai", or "ollama" (auto-detect if None)
+    AI_PROVIDER: Optional[str] = None  # "anthropic", "openai", "ollama" or "mock" (auto-detect if None)
     ANTHROPIC_API_KEY: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
     AI_MODEL: str = "claude-sonnet-4-20250514"  # Model name for all providers
+    AI_MAX_TOKENS: int = 4096  # Output token limit per extraction call
+    # USD per million tokens [input, output, cached input] by model, as JSON;
+    # extends/overrides the built-in prices in app.services.usage
+    AI_PRICING: Dict[str, List[float]] = {}
+
+    # Multi-provider routing: when enabled, AI_PROVIDER/AI_MODEL are replaced
+    # by the routes in AI_ROUTER_PROVIDERS (provider:model[:weight], comma
+    # separated), chosen per request by latency and error rate with failover
+    AI_ROUTER_ENABLED: bool = False
+    AI_ROUTER_PROVIDERS: str = ""
+    AI_ROUTER_WINDOW: int = 50  # Recent calls kept per route
+    AI_ROUTER_ERROR_THRESHOLD: float = 0.5  # Error rate that takes a route out of rotation
+    AI_ROUTER_COOLDOWN_SECONDS: int = 30  # Time out of rotation before it is retried
+    AI_ROUTER_DEFAULT_LATENCY_MS: int = 1000  # Assumed latency of unmeasured routes
+
+    # Large templates are split by top-level section into sub-schemas that
+    # are extracted in parallel calls and merged
+    AI_SPLIT_ENABLED: bool = True
+    AI_SPLIT_TOKEN_THRESHOLD: int = 2000  # Estimated schema + output tokens per call
+    AI_SPLIT_TOKENS_PER_FIELD: int = 30  # Estimated output tokens per extracted field
+
+    # Long reports are split on section boundaries into chunks that are
+    # extracted in parallel and merged field by field
+    AI_CHUNK_ENABLED: bool = True
+    AI_CHUNK_THRESHOLD_CHARS: int = 12000  # Reports longer than this are chunked
+    AI_CHUNK_MAX_CHARS: int = 6000  # Target chunk size
+    # Most chunk x section calls one report makes at a time (per worker process)
+    AI_MAX_PARALLEL_CALLS: int = 4
+
+    # Provider batch mode: uploads of at least AI_BATCH_MODE_MIN_REPORTS
+    # reports are submitted to the provider's asynchronous batch API
+    # (Anthropic Message Batches / OpenAI Batch) in chunks instead of being
+    # extracted one call per task. Results arrive within 24h at half price
+    # and are collected by a periodic task (requires Celery beat).
+    AI_BATCH_MODE_ENABLED: bool = False
+    AI_BATCH_MODE_MIN_REPORTS: int = 1000
+    AI_BATCH_CHUNK_SIZE: int = 10000  # Requests per provider batch
+    AI_BATCH_POLL_INTERVAL_SECONDS: int = 60
+    AI_BATCH_WRITE_SIZE: int = 500  # Results written back per transaction
+    AI_BATCH_BASE_URL: Optional[str] = None  # Batch API endpoint override, e.g. fake_batch_server.py
 
     # Ollama settings
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+
+    # Mock provider (AI_PROVIDER=mock) for benchmarks: simulated call latency
+    MOCK_LATENCY_MS: int = 2000  # Median latency
+    MOCK_LATENCY_SIGMA: float = 0.5  # Log-normal spread, higher means a longer tail
+
+    # Model cascade: a small model extracts first and only reports rejected by
+    # the quality gate are escalated to AI_PROVIDER/AI_MODEL
+    AI_CASCADE_ENABLED: bool = False
+    AI_CASCADE_PROVIDER: str = "ollama"  # Provider for the small model
+    AI_CASCADE_MODEL: str = "gemma3"  # Small/fast model name
+    AI_CASCADE_MAX_NULL_RATIO: float = 0.6  # Reject if more fields than this are null
+    AI_CASCADE_REQUIRED_FIELDS: str = "impression"  # Comma-separated, must be non-null
+    
+    # In-flight coalescing: identical concurrent extractions share one LLM call
+    COALESCE_ENABLED: bool = True
+    COALESCE_LOCK_TTL_SECONDS: int = 180  # Longest an extraction may hold the lock
+    COALESCE_RESULT_TTL_SECONDS: int = 60  # How long a finished result is shared
+    COALESCE_POLL_INTERVAL_MS: int = 200
+    
+    # Near-duplicate detection: only one report per cluster of near-identical
+    # reports is sent to the LLM and its result is copied to the others.
+    # Similar reports are only grouped if they differ in nothing but dates,
+    # times, identifiers and punctuation.
+    # Reports of earlier uploads with the same template are grouped too.
+    NEAR_DUPLICATE_ENABLED: bool = False
+    
+    # Worker result buffer: completed results are committed in bulk every
+    # RESULT_BUFFER_SIZE results or RESULT_BUFFER_FLUSH_MS milliseconds.
+    # Only used with a threads or gevent worker pool, where concurrent tasks
+    # in one process share a buffer; ignored (with a warning) under prefork
+    # and solo, which run one task per process at a time.
+    RESULT_BUFFER_ENABLED: bool = False
+    RESULT_BUFFER_SIZE: int = 50
+    RESULT_BUFFER_FLUSH_MS: int = 200
+    RESULT_SAVE_MAX_RETRIES: int = 8  # Save retries (with backoff) before a computed result is marked failed
+    
+    # Admission control for uploads (429 with Retry-After when over limits)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE_DEPTH: int = 10000  # Messages waiting in the Celery queue
+    ADMISSION_MAX_PENDING_REPORTS: int = 50000  # Reports pending or processing
+    # Per-owner pending or processing reports. Advisory: the owner is the
+    # unauthenticated owner_id form field, so uploads without it aren't limited.
+    ADMISSION_OWNER_MAX_IN_FLIGHT: int = 20000
+    ADMISSION_THROUGHPUT_WINDOW_SECONDS: int = 300  # Window for Retry-After estimate
+    ADMISSION_DEFAULT_RETRY_AFTER: int = 60  # Used when there is no recent throughput
+    
+    # Batch status cache: summaries served from Redis with ETags so unchanged
+    # polls get 304; workers invalidate entries when progress changes
+    BATCH_CACHE_ENABLED: bool = True
+    BATCH_CACHE_TTL_SECONDS: int = 5
+    
+    # Analytics export: completed batches are written to Parquet partitions
+    # (one column per template field) under ANALYTICS_EXPORT_DIR
+    ANALYTICS_EXPORT_ENABLED: bool = False
+    ANALYTICS_EXPORT_DIR: str = "./analytics"
+    ANALYTICS_EXPORT_CHUNK_SIZE: int = 1000  # Reports per Parquet row group
+    
+    # Report storage: on Postgres, new databases range-partition
+    # structured_reports by batch_id so whole batches can be archived or
+    # deleted by dropping partitions
+    REPORT_PARTITIONING_ENABLED: bool = True
+    REPORT_PARTITION_BATCH_SPAN: int = 100  # Batches per partition
+    
+    # Report text is stored zstd-compressed. Each template gets a dictionary
+    # trained on its first upload of at least REPORT_DICTIONARY_MIN_SAMPLES
+    # reports, which makes short boilerplate-heavy reports compress well.
+    REPORT_COMPRESSION_LEVEL: int = 9
+    REPORT_DICTIONARY_ENABLED: bool = True
+    REPORT_DICTIONARY_SIZE: int = 16384  # Bytes
+    REPORT_DICTIONARY_MIN_SAMPLES: int = 200
+    REPORT_DICTIONARY_MAX_SAMPLES: int = 5000  # Reports sampled for training
+    
+    # Archival: completed batches older than the retention window are moved
+    # to zstd Parquet under REPORT_ARCHIVE_DIR; batch rows stay in the database
+    REPORT_ARCHIVE_ENABLED: bool = False
+    REPORT_RETENTION_DAYS: int = 90
+    REPORT_ARCHIVE_DIR: str = "./archive"
+    REPORT_ARCHIVE_INTERVAL_SECONDS: int = 3600  # How often the archival job runs
+    
+    # Celery worker tuning. LLM calls are long and I/O-bound, so by default
+    # each worker process reserves only the task it is running.
+    CELERY_WORKER_POOL: str = "prefork"  # prefork, threads, gevent or solo
+    CELERY_WORKER_CONCURRENCY: Optional[int] = None  # Defaults to the number of CPUs
+    CELERY_PREFETCH_MULTIPLIER: int = 1
+    CELERY_ACKS_LATE: bool = True  # Required for crash safety of the result buffer
+    
+    # Worker autoscaling from queue depth and observed LLM latency (prefork only)
+    CELERY_AUTOSCALE_ENABLED: bool = False
+    CELERY_AUTOSCALE_MIN: int = 2
+    CELERY_AUTOSCALE_MAX: int = 16
+    CELERY_AUTOSCALE_TARGET_DRAIN_SECONDS: int = 60  # Aim to clear the backlog within this time
+    CELERY_AUTOSCALE_DEFAULT_LATENCY_MS: int = 5000  # Used until latency samples exist
+    # Run the periodic task scheduler inside the worker (enable on one worker only)
+    CELERY_BEAT_ENABLED: bool = False
+    
+    # Tracing (OpenTelemetry), exported locally without a collector
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "file"  # "file" (JSON lines) or "console"
+    TRACING_FILE: str = "./traces/spans.jsonl"
+    
+    # Profiling: sampling profiles (wall and CPU, folded stacks for flame
+    # graphs) for API requests sent with X-Profile: 1 or ?profile=1
+    # (only when PROFILING_ENABLED), tasks queued with profile=True, and
+    # every Nth task per worker process
+    PROFILING_ENABLED: bool = False
+    PROFILING_DIR: str = "./profiles"
+    PROFILING_INTERVAL_MS: int = 5
+    PROFILING_EVERY_N_TASKS: int = 0  # 0 disables periodic task profiling
     
     # File Upload
     MAX_UPLOAD_SIZE: int = 52428800  # 50MB in bytes
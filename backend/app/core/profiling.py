@@ -0,0 +1,123 @@
+"""
+On-demand sampling profiler for API requests and worker tasks.
+
+A background thread samples the profiled thread's stack every
+PROFILING_INTERVAL_MS. Every sample counts towards the wall-clock profile;
+samples taken while the thread's CPU clock advanced also count towards the
+CPU profile. Both are written to PROFILING_DIR in the collapsed-stack
+("folded") format read by flamegraph.pl, speedscope and inferno.
+
+Only the thread that entered profile() is sampled. For API requests that is
+the event loop thread, so other requests running concurrently on the loop
+show up as well. Work handed to the threadpool appears as the awaiting
+frame.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from app.core.config import settings
+
+_task_counter = itertools.count(1)
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = "/".join(code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _folded_stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        try:
+            self.clock_id: Optional[int] = time.pthread_getcpuclockid(thread_id)
+        except (AttributeError, OSError):
+            # Per-thread CPU clocks are not available on this platform
+            self.clock_id = None
+
+    def _cpu_time(self) -> float:
+        return time.clock_gettime(self.clock_id) if self.clock_id is not None else 0.0
+
+    def _run(self):
+        last_cpu = self._cpu_time()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = _folded_stack(frame)
+            self.wall[stack] += 1
+
+            cpu = self._cpu_time()
+            # Count as on-CPU if the thread ran for at least half the interval
+            if cpu - last_cpu >= self.interval / 2:
+                self.cpu[stack] += 1
+            last_cpu = cpu
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _write_folded(path: str, samples: Counter):
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile(name: str) -> Iterator[str]:
+    """
+    Sample the calling thread while the block runs. Yields the profile id;
+    the profiles are written to PROFILING_DIR/<id>.wall.folded and
+    <id>.cpu.folded.
+    """
+    profile_id = _UNSAFE_NAME_RE.sub("_", f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{name}")
+    sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+    sampler.start()
+    try:
+        yield profile_id
+    finally:
+        sampler.stop()
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILING_DIR, profile_id)
+        _write_folded(f"{base}.wall.folded", sampler.wall)
+        if sampler.clock_id is not None:
+            _write_folded(f"{base}.cpu.folded", sampler.cpu)
+
+
+def should_sample_task() -> bool:
+    """True for every PROFILING_EVERY_N_TASKS-th task run in this process"""
+    every = settings.PROFILING_EVERY_N_TASKS
+    return every > 0 and next(_task_counter) % every == 0
+
+
+def profile_requested(value: Optional[str]) -> bool:
+    """Whether a profile flag (header or query parameter) asks for a profile"""
+    return value is not None and value.strip().lower() in _TRUE_VALUES
@@ -0,0 +1,7 @@
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+# Clients connect lazily, so importing this module never touches Redis
+redis_client = redis.Redis.from_url(settings.REDIS_URL)
+async_redis_client = aioredis.Redis.from_url(settings.REDIS_URL)
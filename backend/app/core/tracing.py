@@ -0,0 +1,146 @@
+"""
+OpenTelemetry tracing from upload to report completion.
+
+When TRACING_ENABLED is set, spans are exported locally (console or a
+JSON-lines file) so no external collector is needed. Trace context is
+carried from the API to the workers in the Celery message headers, so the
+upload, broker publish, task execution, DB queries and LLM calls of a
+report all belong to one trace.
+"""
+from typing import Dict, Sequence, Tuple
+import json
+import os
+from celery.signals import after_task_publish, before_task_publish, task_postrun, task_prerun
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+tracer = trace.get_tracer("radstruct")
+
+# Open publish/task spans, keyed by Celery task id
+_publish_spans: Dict[str, trace.Span] = {}
+_task_spans: Dict[str, Tuple[trace.Span, object]] = {}
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a local file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+        # Opened per export so forked worker processes never share a buffer
+        with open(self.path, "a") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def setup_tracing(service_name: str) -> None:
+    """Install the tracer provider and instrumentation for this process"""
+    if not settings.TRACING_ENABLED:
+        return
+
+    if settings.TRACING_EXPORTER == "file":
+        exporter = JsonLinesSpanExporter(settings.TRACING_FILE)
+    else:
+        exporter = ConsoleSpanExporter()
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    # Imported here to avoid a circular import with app.core.database
+    from app.core.database import async_engine, engine
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
+    before_task_publish.connect(_on_before_publish, weak=False)
+    after_task_publish.connect(_on_after_publish, weak=False)
+    task_prerun.connect(_on_task_prerun, weak=False)
+    task_postrun.connect(_on_task_postrun, weak=False)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Create a span for every SQL statement executed on the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, ctx, executemany):
+        ctx._otel_span = tracer.start_span(
+            f"db {statement.split(None, 1)[0] if statement else 'query'}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.statement": statement[:1000],
+                "db.executemany": executemany,
+            },
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, ctx, executemany):
+        span = getattr(ctx, "_otel_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        span = getattr(exception_context.execution_context, "_otel_span", None)
+        if span is not None:
+            span.set_status(Status(StatusCode.ERROR, str(exception_context.original_exception)))
+            span.end()
+
+
+def _on_before_publish(sender=None, headers=None, **kwargs):
+    if headers is None:
+        return
+    span = tracer.start_span(f"publish {sender}", kind=SpanKind.PRODUCER)
+    # The trace context travels with the message
+    propagate.inject(headers, context=trace.set_span_in_context(span))
+    _publish_spans[headers.get("id")] = span
+
+
+def _on_after_publish(sender=None, headers=None, **kwargs):
+    span = _publish_spans.pop((headers or {}).get("id"), None)
+    if span is not None:
+        span.end()
+
+
+def _on_task_prerun(task_id=None, task=None, args=None, **kwargs):
+    carrier = {
+        key: value for key in ("traceparent", "tracestate")
+        if (value := task.request.get(key)) is not None
+    }
+    parent = propagate.extract(carrier)
+    span = tracer.start_span(
+        task.name,
+        context=parent,
+        kind=SpanKind.CONSUMER,
+        attributes={"celery.task_id": task_id, "celery.args": json.dumps(args, default=str)},
+    )
+    token = context.attach(trace.set_span_in_context(span, parent))
+    _task_spans[task_id] = (span, token)
+
+
+def _on_task_postrun(task_id=None, state=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    if state:
+        span.set_attribute("celery.state", state)
+    span.end()
+    context.detach(token)
@@ -1,9 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from opentelemetry.trace import SpanKind
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.profiling import profile, profile_requested
+from app.core.tracing import setup_tracing, tracer
 from app.api import templates, reports
 
+setup_tracing("radstruct-api")
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
@@ -22,6 +27,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.TRACING_ENABLED:
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        """Root span for each API request"""
+        with tracer.start_as_current_span(
+            f"{request.method} {request.url.path}",
+            kind=SpanKind.SERVER
+        ) as span:
+            response = await call_next(request)
+            span.set_attribute("http.status_code", response.status_code)
+            return response
+
+if settings.PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile requests sent with X-Profile: 1 or ?profile=1 (or true/yes/on)"""
+        if not (
+            profile_requested(request.headers.get("X-Profile"))
+            or profile_requested(request.query_params.get("profile"))
+        ):
+            return await call_next(request)
+        with profile(f"api-{request.method}-{request.url.path}") as profile_id:
+            response = await call_next(request)
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
 # Include routers
 app.include_router(templates.router, prefix="/api")
 app.include_router(reports.router, prefix="/api")
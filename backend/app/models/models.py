@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON, ForeignKey, Boolean, Float, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
-from app.core.database import Base
+from app.core.compression import CompressedText
+from app.core.database import Base, REPORTS_PARTITIONED
 
 
 class User(Base):
@@ -36,6 +37,18 @@ class Template(Base):
     reports = relationship("StructuredReport", back_populates="template")
 
 
+class TextDictionary(Base):
+    # zstd dictionary for compressing the report text of a template
+    __tablename__ = "text_dictionaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(Integer, nullable=False, index=True)  # No foreign key: frames outlive templates
+    dict_id = Column(BigInteger, nullable=False, unique=True)  # zstd dictionary id, recorded in each frame
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer)  # Reports the dictionary was trained on
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class ReportBatch(Base):
     __tablename__ = "report_batches"
     
@@ -48,25 +61,70 @@ class ReportBatch(Base):
     template_id = Column(Integer, ForeignKey("templates.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    tier_stats = Column(JSON, nullable=True)  # Per-tier report counts and latency
+    archived_at = Column(DateTime(timezone=True), nullable=True)  # Reports moved to archive_path
+    archive_path = Column(String, nullable=True)
     
     owner = relationship("User", back_populates="batches")
     reports = relationship("StructuredReport", back_populates="batch")
 
 
+class ProviderBatch(Base):
+    # A chunk of a report batch submitted to a provider's batch API
+    __tablename__ = "provider_batches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(Integer, ForeignKey("report_batches.id"), nullable=False, index=True)
+    provider = Column(String, nullable=False)  # anthropic, openai
+    model = Column(String, nullable=False)
+    external_id = Column(String, nullable=False)  # Provider's batch id
+    status = Column(String, default="submitted")  # submitted, collected
+    request_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    collected_at = Column(DateTime(timezone=True), nullable=True)
+
+
 class StructuredReport(Base):
     __tablename__ = "structured_reports"
+    # Range-partitioned by batch_id on Postgres. The partition key must be
+    # part of the primary key, but reports are still identified by id alone.
+    __table_args__ = {"postgresql_partition_by": "RANGE (batch_id)"} if REPORTS_PARTITIONED else {}
     
-    id = Column(Integer, primary_key=True, index=True)
-    batch_id = Column(Integer, ForeignKey("report_batches.id"))
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    batch_id = Column(Integer, ForeignKey("report_batches.id"), primary_key=REPORTS_PARTITIONED)
     template_id = Column(Integer, ForeignKey("templates.id"))
-    original_text = Column(Text, nullable=False)
+    # zstd-compressed, only loaded (and decompressed) when accessed or undeferred
+    original_text = deferred(Column(CompressedText, nullable=False))
+    text_length = Column(Integer, nullable=True)  # Characters in original_text
     structured_data = Column(JSON)  # Extracted structured data
     confidence_score = Column(Integer)  # 0-100
-    status = Column(String, default="pending")  # pending, processing, completed, failed
+    status = Column(String, default="pending", index=True)  # pending, processing, submitted, completed, failed
     error_message = Column(Text, nullable=True)
+    extraction_tier = Column(String, nullable=True)  # small, large
+    provider = Column(String, nullable=True)  # LLM provider that produced the result
+    model = Column(String, nullable=True)  # LLM model that produced the result
+    escalated = Column(Boolean, default=False)  # Small model result was rejected
+    latency_ms = Column(Integer, nullable=True)  # Total LLM time for this report
+    llm_calls = Column(Integer, nullable=True)  # Calls made for this report (null if none)
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)  # Part of input_tokens served from cache
+    cost_usd = Column(Float, nullable=True)  # Null if a model's price is unknown
+    provider_batch_id = Column(Integer, nullable=True, index=True)  # ProviderBatch while submitted
+    # Cluster representative (no foreign key when partitioned: id alone isn't unique-constrained)
+    duplicate_of_id = Column(
+        Integer,
+        *([] if REPORTS_PARTITIONED else [ForeignKey("structured_reports.id", ondelete="SET NULL")]),
+        nullable=True,
+        index=True
+    )
+    content_key = Column(String, nullable=True, index=True)  # Near-duplicate group, per template
+    is_propagated = Column(Boolean, default=False)  # Result copied from duplicate_of_id
     filename = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    processed_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
     batch = relationship("ReportBatch", back_populates="reports")
     template = relationship("Template", back_populates="reports")
+    
+    __mapper_args__ = {"primary_key": [id]}
@@ -57,6 +57,10 @@ class ReportBatchCreate(BaseModel):
     template_id: int
 
 
+class ReportBatchBulkDelete(BaseModel):
+    batch_ids: List[int]
+
+
 class ReportBatchResponse(BaseModel):
     id: int
     name: str
@@ -64,8 +68,11 @@ class ReportBatchResponse(BaseModel):
     total_reports: int
     processed_reports: int
     template_id: int
+    owner_id: Optional[int] = None
     created_at: datetime
     completed_at: Optional[datetime]
+    tier_stats: Optional[Dict[str, Any]] = None
+    archived_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -76,11 +83,24 @@ class StructuredReportResponse(BaseModel):
     id: int
     batch_id: int
     template_id: int
-    original_text: str
+    original_text: Optional[str] = None  # Only included when requested
+    text_length: Optional[int] = None
     structured_data: Optional[Dict[str, Any]]
     confidence_score: Optional[int]
     status: str
     error_message: Optional[str]
+    extraction_tier: Optional[str] = None
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    escalated: Optional[bool] = None
+    latency_ms: Optional[int] = None
+    llm_calls: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    duplicate_of_id: Optional[int] = None
+    is_propagated: Optional[bool] = None
     filename: Optional[str]
     created_at: datetime
     processed_at: Optional[datetime]
@@ -89,6 +109,21 @@ class StructuredReportResponse(BaseModel):
         from_attributes = True
 
 
+# Usage Schemas
+class UsageRollup(BaseModel):
+    group_by: str
+    key: Optional[Any]
+    reports: int
+    llm_calls: Optional[int]
+    input_tokens: Optional[int]
+    output_tokens: Optional[int]
+    cached_tokens: Optional[int]
+    cost_usd: Optional[float]
+    avg_latency_ms: Optional[float]
+    max_latency_ms: Optional[int]
+    avg_report_chars: Optional[float]
+
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
@@ -97,3 +132,4 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
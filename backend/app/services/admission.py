@@ -0,0 +1,103 @@
+"""
+Admission control for batch uploads.
+
+An upload is rejected when the broker queue, the number of outstanding
+(pending/processing) reports or the owner's in-flight reports would exceed
+the configured limits. Rejections carry a Retry-After estimate based on the
+throughput observed over the recent window.
+
+The owner is whatever owner_id the client sends with the upload; there is
+no authentication, so the per-owner quota only limits clients that
+identify themselves and is advisory.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+import math
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.core.redis_client import async_redis_client
+from app.models.models import ReportBatch, StructuredReport
+
+IN_FLIGHT_STATUSES = ["pending", "processing"]
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+async def get_queue_depth() -> Optional[int]:
+    """Number of messages waiting in the Celery queue, or None if Redis is unavailable"""
+    try:
+        return await async_redis_client.llen(celery_app.conf.task_default_queue)
+    except Exception:
+        return None
+
+
+async def get_throughput(db: AsyncSession) -> float:
+    """Reports processed per second over the recent window"""
+    window = settings.ADMISSION_THROUGHPUT_WINDOW_SECONDS
+    cutoff = datetime.utcnow() - timedelta(seconds=window)
+    processed = await db.scalar(
+        select(func.count(StructuredReport.id)).filter(StructuredReport.processed_at >= cutoff)
+    )
+    return (processed or 0) / window
+
+
+async def estimate_retry_after(db: AsyncSession, excess: int) -> int:
+    """Seconds until roughly `excess` reports have drained at recent throughput"""
+    throughput = await get_throughput(db)
+    if throughput <= 0:
+        return settings.ADMISSION_DEFAULT_RETRY_AFTER
+    return max(1, min(3600, math.ceil(excess / throughput)))
+
+
+async def check_admission(db: AsyncSession, incoming: int, owner_id: Optional[int] = None):
+    """
+    Raise AdmissionRejected if accepting `incoming` more reports would exceed
+    the queue, outstanding-report or per-owner limits. A limit is never
+    enforced against an empty system, so an oversized upload can still run
+    on its own.
+    """
+    queue_depth = await get_queue_depth()
+    if queue_depth is not None and queue_depth > 0:
+        excess = queue_depth + incoming - settings.ADMISSION_MAX_QUEUE_DEPTH
+        if excess > 0:
+            raise AdmissionRejected(
+                f"Task queue is full ({queue_depth} queued)",
+                await estimate_retry_after(db, excess)
+            )
+
+    outstanding = await db.scalar(
+        select(func.count(StructuredReport.id)).filter(
+            StructuredReport.status.in_(IN_FLIGHT_STATUSES)
+        )
+    )
+    if outstanding:
+        excess = outstanding + incoming - settings.ADMISSION_MAX_PENDING_REPORTS
+        if excess > 0:
+            raise AdmissionRejected(
+                f"Too many reports awaiting processing ({outstanding})",
+                await estimate_retry_after(db, excess)
+            )
+
+    if owner_id is not None:
+        owner_in_flight = await db.scalar(
+            select(func.count(StructuredReport.id))
+            .join(ReportBatch, StructuredReport.batch_id == ReportBatch.id)
+            .filter(
+                ReportBatch.owner_id == owner_id,
+                StructuredReport.status.in_(IN_FLIGHT_STATUSES)
+            )
+        )
+        if owner_in_flight:
+            excess = owner_in_flight + incoming - settings.ADMISSION_OWNER_MAX_IN_FLIGHT
+            if excess > 0:
+                raise AdmissionRejected(
+                    f"In-flight report quota exceeded ({owner_in_flight} in flight)",
+                    await estimate_retry_after(db, excess)
+                )
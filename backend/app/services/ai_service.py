@@ -1,9 +1,80 @@
-from typing import Dict, Any, Optional, Type
+from typing import Dict, Any, List, Optional, Type, Iterator, Tuple
+import asyncio
+import hashlib
 import json
+import random
+import re
+import time
 from anthropic import Anthropic
 from openai import OpenAI
+from openai.lib._parsing import type_to_response_format_param
+from opentelemetry.trace import SpanKind
 from pydantic import BaseModel, Field, create_model
 from app.core.config import settings
+from app.core.tracing import tracer
+from app.services.coalescing import singleflight
+from app.services.provider_router import ProviderRouter, Route, parse_routes
+from app.services.report_chunking import chunk_report, merge_extractions
+from app.services.usage import make_usage, sum_usage
+
+
+def iter_template_fields(
+    template_structure: Dict[str, Any],
+    prefix: Tuple[str, ...] = ()
+) -> Iterator[Tuple[Tuple[str, ...], bool]]:
+    """
+    Yield (path, is_leaf) for every field in the template structure,
+    using the same nesting rules as AIService._create_pydantic_model_from_template.
+    """
+    for key, value in template_structure.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and not ('type' in value and 'description' in value):
+            yield path, False
+            yield from iter_template_fields(value, path)
+        else:
+            yield path, True
+
+
+_WORD_RE = re.compile(r"[a-z0-9]{4,}")
+
+
+def estimate_template_tokens(template_structure: Dict[str, Any]) -> int:
+    """
+    Rough token estimate for extracting a template in one call: the schema
+    sent with the prompt (~4 characters per token) plus the expected output
+    for each leaf field.
+    """
+    schema_tokens = len(json.dumps(template_structure)) // 4
+    leaves = sum(1 for _, is_leaf in iter_template_fields(template_structure) if is_leaf)
+    return schema_tokens + leaves * settings.AI_SPLIT_TOKENS_PER_FIELD
+
+
+def split_template(template_structure: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Partition a template into sub-templates of whole top-level sections,
+    each estimated to fit under AI_SPLIT_TOKEN_THRESHOLD. Sections are
+    packed in template order; a single section over the threshold gets a
+    part of its own. Small templates are returned as a single part.
+    """
+    if (
+        not settings.AI_SPLIT_ENABLED
+        or estimate_template_tokens(template_structure) <= settings.AI_SPLIT_TOKEN_THRESHOLD
+    ):
+        return [template_structure]
+
+    parts: List[Dict[str, Any]] = []
+    current: Dict[str, Any] = {}
+    current_tokens = 0
+    for key, value in template_structure.items():
+        tokens = estimate_template_tokens({key: value})
+        if current and current_tokens + tokens > settings.AI_SPLIT_TOKEN_THRESHOLD:
+            parts.append(current)
+            current, current_tokens = {}, 0
+        current[key] = value
+        current_tokens += tokens
+    if current:
+        parts.append(current)
+    return parts
 
 
 class AIService:
@@ -14,24 +85,37 @@ class AIService:
 
         # Initialize the appropriate client
         if self.provider == "anthropic":
-            self.anthropic_client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-        elif self.provider == "openai":
-            self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        elif self.provider == "ollama":
+            self.anthropic_client = self._create_client(self.provider)
+        elif self.provider in ["openai", "ollama"]:
             # Ollama supports OpenAI-compatible API - reuse OpenAI client
-            self.openai_client = OpenAI(
-                base_url=f"{settings.OLLAMA_BASE_URL}/v1",
-                api_key="ollama"  # Dummy key, Ollama doesn't require authentication
-            )
+            self.openai_client = self._create_client(self.provider)
+        elif self.provider == "mock":
+            # Simulated provider for benchmarks, no client needed
+            pass
         else:
             raise ValueError("No AI provider configured")
 
+        # Optional small-model tier tried before the main model
+        self.cascade_provider: Optional[str] = None
+        self.cascade_client: Optional[Any] = None
+        if settings.AI_CASCADE_ENABLED:
+            self.cascade_provider = settings.AI_CASCADE_PROVIDER.lower()
+            self.cascade_client = self._create_client(self.cascade_provider)
+
+        # Optional latency-aware routing across several providers
+        self.router: Optional[ProviderRouter] = None
+        if settings.AI_ROUTER_ENABLED:
+            self.router = ProviderRouter([
+                Route(provider, model, self._create_client(provider), weight)
+                for provider, model, weight in parse_routes(settings.AI_ROUTER_PROVIDERS)
+            ])
+
     def _determine_provider(self) -> str:
         """Auto-detect which AI provider to use"""
         # If explicitly set, use that
         if settings.AI_PROVIDER:
             provider = settings.AI_PROVIDER.lower()
-            if provider not in ["anthropic", "openai", "ollama"]:
+            if provider not in ["anthropic", "openai", "ollama", "mock"]:
                 raise ValueError(f"Invalid AI_PROVIDER: {provider}")
             return provider
 
@@ -44,6 +128,22 @@ class AIService:
             # Default to Ollama (localhost) if no API keys
             return "ollama"
 
+    def _create_client(self, provider: str) -> Any:
+        """Create the API client for a provider"""
+        if provider == "anthropic":
+            return Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        elif provider == "openai":
+            return OpenAI(api_key=settings.OPENAI_API_KEY)
+        elif provider == "ollama":
+            # Ollama supports OpenAI-compatible API - reuse OpenAI client
+            return OpenAI(
+                base_url=f"{settings.OLLAMA_BASE_URL}/v1",
+                api_key="ollama"  # Dummy key, Ollama doesn't require authentication
+            )
+        elif provider == "mock":
+            return None
+        raise ValueError(f"Invalid AI provider: {provider}")
+
     def _create_pydantic_model_from_template(
         self,
         template_structure: Dict[str, Any],
@@ -98,27 +198,320 @@ class AIService:
         Use AI to extract structured data from free-text report
         according to the provided template structure.
         Uses structured outputs with Pydantic models for guaranteed schema compliance.
+
+        When the cascade is enabled the small model is tried first and the
+        report is only escalated to the main model if the result fails the
+        quality gate. With the router enabled the main model is picked per
+        request from AI_ROUTER_PROVIDERS. The returned dict also carries the
+        provider, model and tier that produced the result, the total LLM
+        latency in milliseconds and the token usage and cost of all calls.
+
+        Identical concurrent requests (same report text and template) are
+        coalesced so only one of them calls the LLM.
         """
-        # Create Pydantic model from template structure
-        response_model = self._create_pydantic_model_from_template(template_structure)
+        if settings.COALESCE_ENABLED:
+            return await singleflight(
+                self._coalesce_key(report_text, template_structure),
+                lambda: self._extract(report_text, template_structure)
+            )
+        return await self._extract(report_text, template_structure)
 
-        # Build prompt
-        prompt = self._build_prompt(report_text, template_structure)
+    def _coalesce_key(self, report_text: str, template_structure: Dict[str, Any]) -> str:
+        """Hash identifying an extraction: report text, template and model"""
+        digest = hashlib.sha256()
+        for part in (
+            settings.AI_ROUTER_PROVIDERS if self.router is not None else self.provider,
+            settings.AI_MODEL,
+            settings.AI_CASCADE_MODEL if self.cascade_provider is not None else "",
+            json.dumps(template_structure, sort_keys=True),
+            report_text
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
 
+    async def _extract(
+        self,
+        report_text: str,
+        template_structure: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run the extraction, through the model cascade if enabled"""
         try:
-            if self.provider == "anthropic":
-                return await self._call_anthropic(prompt, response_model)
-            elif self.provider in ["openai", "ollama"]:
-                # Both OpenAI and Ollama use the same client (OpenAI-compatible API)
-                return await self._call_openai(prompt, response_model)
+            start = time.perf_counter()
+            escalated = False
+            small_usage = None
+
+            if self.cascade_provider is not None:
+                try:
+                    result = await self._extract_with(
+                        self.cascade_provider,
+                        self.cascade_client,
+                        settings.AI_CASCADE_MODEL,
+                        report_text,
+                        template_structure
+                    )
+                    small_usage = result["usage"]
+                    rejection = self._quality_gate(result["structured_data"], template_structure)
+                except Exception as e:
+                    rejection = f"small model error: {str(e)}"
+
+                if rejection is None:
+                    result["provider"] = self.cascade_provider
+                    result["model"] = settings.AI_CASCADE_MODEL
+                    result["tier"] = "small"
+                    result["escalated"] = False
+                    result["latency_ms"] = int((time.perf_counter() - start) * 1000)
+                    return self._finish(result, report_text, template_structure)
+                escalated = True
+
+            if self.router is not None:
+                result, route = await self.router.call(
+                    lambda route: self._extract_with(
+                        route.provider, route.client, route.model, report_text, template_structure
+                    )
+                )
+                result["provider"] = route.provider
+                result["model"] = route.model
             else:
-                raise ValueError(f"Unsupported AI provider: {self.provider}")
+                client = self.anthropic_client if self.provider == "anthropic" else self.openai_client
+                result = await self._extract_with(
+                    self.provider, client, settings.AI_MODEL, report_text, template_structure
+                )
+                result["provider"] = self.provider
+                result["model"] = settings.AI_MODEL
+            result["tier"] = "large"
+            result["escalated"] = escalated
+            result["latency_ms"] = int((time.perf_counter() - start) * 1000)
+            # The rejected small-model attempt is paid for as well
+            result["usage"] = sum_usage([small_usage, result["usage"]])
+            return self._finish(result, report_text, template_structure)
         except Exception as e:
             raise Exception(f"AI processing failed: {str(e)}")
-    
-    def _build_prompt(self, report_text: str, template_structure: Dict[str, Any]) -> str:
-        """Build the prompt for the AI model"""
+
+    async def _extract_with(
+        self,
+        provider: str,
+        client: Any,
+        model: str,
+        report_text: str,
+        template_structure: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Extract a template with one model. Reports longer than
+        AI_CHUNK_THRESHOLD_CHARS are split on section boundaries into chunks
+        that are extracted in parallel and reduced with the per-field merge
+        rules of app.services.report_chunking. At most AI_MAX_PARALLEL_CALLS
+        of the report's provider calls run at a time.
+        """
+        if settings.AI_CHUNK_ENABLED and len(report_text) > settings.AI_CHUNK_THRESHOLD_CHARS:
+            chunks = chunk_report(report_text, settings.AI_CHUNK_MAX_CHARS)
+        else:
+            chunks = [report_text]
+
+        call_slots = asyncio.Semaphore(settings.AI_MAX_PARALLEL_CALLS)
+        results = await asyncio.gather(*[
+            self._extract_chunk(
+                provider,
+                client,
+                model,
+                chunk,
+                template_structure,
+                call_slots,
+                (index + 1, len(chunks)) if len(chunks) > 1 else None
+            )
+            for index, chunk in enumerate(chunks)
+        ])
+        if len(results) == 1:
+            return results[0]
+
+        return {
+            "structured_data": merge_extractions(
+                [result["structured_data"] for result in results], template_structure
+            ),
+            "usage": sum_usage([result["usage"] for result in results]),
+            "truncated": any(result["truncated"] for result in results)
+        }
+
+    async def _extract_chunk(
+        self,
+        provider: str,
+        client: Any,
+        model: str,
+        report_text: str,
+        template_structure: Dict[str, Any],
+        call_slots: asyncio.Semaphore,
+        chunk: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract a template from one report (chunk). Large templates are split
+        into sub-templates that are extracted in parallel against the same
+        text and merged; the parts have disjoint top-level keys. Each call
+        holds one of the report's call_slots.
+        """
+        async def call(part: Dict[str, Any]) -> Dict[str, Any]:
+            async with call_slots:
+                return await self._call_provider(
+                    provider,
+                    client,
+                    model,
+                    self._build_prompt(report_text, part, chunk),
+                    self._create_pydantic_model_from_template(part)
+                )
+
+        parts = split_template(template_structure)
+        results = await asyncio.gather(*[call(part) for part in parts])
+        if len(results) == 1:
+            return results[0]
+
+        structured_data = {key: None for key in template_structure}
+        for result in results:
+            structured_data.update(result["structured_data"] or {})
+        return {
+            "structured_data": structured_data,
+            "usage": sum_usage([result["usage"] for result in results]),
+            "truncated": any(result["truncated"] for result in results)
+        }
+
+    async def _call_provider(
+        self,
+        provider: str,
+        client: Any,
+        model: str,
+        prompt: str,
+        response_model: Type[BaseModel]
+    ) -> Dict[str, Any]:
+        """
+        Dispatch a structured extraction call to the given provider.
+        The result's token counts are priced for the model.
+        """
+        with tracer.start_as_current_span(
+            f"llm {provider}",
+            kind=SpanKind.CLIENT,
+            attributes={"llm.provider": provider, "llm.model": model}
+        ) as span:
+            if provider == "anthropic":
+                result = await self._call_anthropic(prompt, response_model, client=client, model=model)
+            elif provider in ["openai", "ollama"]:
+                # Both OpenAI and Ollama use the same client (OpenAI-compatible API)
+                result = await self._call_openai(prompt, response_model, client=client, model=model)
+            elif provider == "mock":
+                result = await self._call_mock(prompt, response_model)
+            else:
+                raise ValueError(f"Unsupported AI provider: {provider}")
+
+            result["usage"] = make_usage(provider, model, **result["usage"])
+            span.set_attribute("llm.input_tokens", result["usage"]["input_tokens"])
+            span.set_attribute("llm.output_tokens", result["usage"]["output_tokens"])
+            return result
+
+    def _finish(
+        self,
+        result: Dict[str, Any],
+        report_text: str,
+        template_structure: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Score the final result's confidence"""
+        result["confidence_score"] = self._score_confidence(
+            report_text, result["structured_data"], template_structure, result.pop("truncated")
+        )
+        return result
+
+    def _score_confidence(
+        self,
+        report_text: str,
+        structured_data: Dict[str, Any],
+        template_structure: Dict[str, Any],
+        truncated: bool
+    ) -> int:
+        """
+        Heuristic 0-100 confidence: the share of extracted fields whose
+        content words appear in the report text, so values the model didn't
+        take from the report lower the score. Capped at 30 when the output
+        was cut off by the token limit, and 0 when nothing was extracted.
+        """
+        report_words = set(_WORD_RE.findall(report_text.lower()))
+        filled = 0
+        grounded = 0
+        for path, is_leaf in iter_template_fields(template_structure):
+            if not is_leaf:
+                continue
+            value: Any = structured_data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None or not str(value).strip():
+                continue
+
+            filled += 1
+            words = _WORD_RE.findall(str(value).lower())
+            if not words or sum(word in report_words for word in words) / len(words) >= 0.5:
+                grounded += 1
+
+        if not filled:
+            return 0
+        score = round(100 * grounded / filled)
+        return min(score, 30) if truncated else score
+
+    def _quality_gate(
+        self,
+        structured_data: Dict[str, Any],
+        template_structure: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Decide whether a small-model extraction is good enough to keep.
+        Returns None if accepted, otherwise the reason for rejection.
+        """
+        if not isinstance(structured_data, dict):
+            return "result is not an object"
+
+        # Schema completeness: every top-level template field must be present
+        missing = [key for key in template_structure if key not in structured_data]
+        if missing:
+            return f"missing fields: {', '.join(missing)}"
+
+        total_leaves = 0
+        null_leaves = 0
+        for path, is_leaf in iter_template_fields(template_structure):
+            value: Any = structured_data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+
+            # Consistency: leaves must be text, sections must be objects
+            if value is not None:
+                if is_leaf and not isinstance(value, str):
+                    return f"field {'.'.join(path)} is not text"
+                if not is_leaf and not isinstance(value, dict):
+                    return f"section {'.'.join(path)} is not an object"
+
+            if is_leaf:
+                total_leaves += 1
+                if value is None or not str(value).strip():
+                    null_leaves += 1
+
+        if total_leaves and null_leaves / total_leaves > settings.AI_CASCADE_MAX_NULL_RATIO:
+            return f"null ratio {null_leaves}/{total_leaves} too high"
+
+        for field in settings.AI_CASCADE_REQUIRED_FIELDS.split(","):
+            field = field.strip()
+            if field and field in template_structure:
+                value = structured_data.get(field)
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    return f"required field {field} is empty"
+
+        return None
+
+    def _build_prompt(
+        self,
+        report_text: str,
+        template_structure: Dict[str, Any],
+        chunk: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """Build the prompt for the AI model (chunk is (part, of) for long reports)"""
         template_fields = json.dumps(template_structure, indent=2)
+        if chunk:
+            report_text = (
+                f"[Excerpt {chunk[0]} of {chunk[1]} of a longer report. "
+                f"Use null for fields not covered by this excerpt.]\n{report_text}"
+            )
         
         prompt = f"""You are a medical AI assistant specialized in structuring radiology reports.
 
@@ -141,24 +534,56 @@ RESPONSE (JSON only):"""
         
         return prompt
     
-    async def _call_anthropic(self, prompt: str, response_model: Type[BaseModel]) -> Dict[str, Any]:
+    async def _call_anthropic(
+        self,
+        prompt: str,
+        response_model: Type[BaseModel],
+        client: Optional[Anthropic] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Call Anthropic's Claude API with structured outputs using tool calling"""
-        # Convert Pydantic model to tool schema
+        client = client or self.anthropic_client
+        # The client is synchronous; run it in a thread so parallel calls overlap
+        message = await asyncio.to_thread(
+            client.messages.create,
+            **self._anthropic_params(prompt, response_model.model_json_schema(), model)
+        )
+        return self._anthropic_result(message)
+
+    def _anthropic_params(
+        self,
+        prompt: str,
+        json_schema: Dict[str, Any],
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Messages API parameters forcing the extraction tool"""
+        # Convert Pydantic model schema to tool schema
         tool_schema = {
             "name": "extract_radiology_data",
             "description": "Extract structured radiology report data according to the template",
-            "input_schema": response_model.model_json_schema()
+            "input_schema": json_schema
         }
-
-        message = self.anthropic_client.messages.create(
-            model=settings.AI_MODEL,
-            max_tokens=2000,
-            tools=[tool_schema],
-            tool_choice={"type": "tool", "name": "extract_radiology_data"},
-            messages=[
+        return {
+            "model": model or settings.AI_MODEL,
+            "max_tokens": settings.AI_MAX_TOKENS,
+            "tools": [tool_schema],
+            "tool_choice": {"type": "tool", "name": "extract_radiology_data"},
+            "messages": [
                 {"role": "user", "content": prompt}
             ]
-        )
+        }
+
+    def _anthropic_result(self, message: Any) -> Dict[str, Any]:
+        """Structured data and raw usage of an Anthropic message"""
+        usage = {
+            "input_tokens": (
+                message.usage.input_tokens
+                + (message.usage.cache_read_input_tokens or 0)
+                + (message.usage.cache_creation_input_tokens or 0)
+            ),
+            "output_tokens": message.usage.output_tokens,
+            "cached_tokens": message.usage.cache_read_input_tokens or 0
+        }
 
         # Extract tool use result
         for content_block in message.content:
@@ -166,25 +591,39 @@ RESPONSE (JSON only):"""
                 structured_data = content_block.input
                 return {
                     "structured_data": structured_data,
-                    "confidence_score": 85
+                    "usage": usage,
+                    "truncated": message.stop_reason == "max_tokens"
                 }
 
         raise Exception("No structured data returned from Anthropic")
 
-    async def _call_openai(self, prompt: str, response_model: Type[BaseModel]) -> Dict[str, Any]:
+    async def _call_openai(
+        self,
+        prompt: str,
+        response_model: Type[BaseModel],
+        client: Optional[OpenAI] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Call OpenAI API (or Ollama with OpenAI-compatible API) with structured outputs"""
+        client = client or self.openai_client
 
         # Use OpenAI's beta parse() method for structured outputs
-        completion = self.openai_client.beta.chat.completions.parse(
-            model=settings.AI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a medical AI assistant specialized in structuring radiology reports."},
-                {"role": "user", "content": prompt}
-            ],
+        completion = await asyncio.to_thread(
+            client.beta.chat.completions.parse,
+            model=model or settings.AI_MODEL,
+            messages=self._openai_messages(prompt),
             response_format=response_model,
-            temperature=0.1
+            temperature=0.1,
+            max_tokens=settings.AI_MAX_TOKENS
         )
 
+        details = getattr(completion.usage, "prompt_tokens_details", None)
+        usage = {
+            "input_tokens": completion.usage.prompt_tokens,
+            "output_tokens": completion.usage.completion_tokens,
+            "cached_tokens": (details.cached_tokens or 0) if details else 0
+        }
+
         # Extract parsed response
         parsed_response = completion.choices[0].message.parsed
         if parsed_response:
@@ -192,10 +631,105 @@ RESPONSE (JSON only):"""
             structured_data = parsed_response.model_dump(exclude_none=False)
             return {
                 "structured_data": structured_data,
-                "confidence_score": 85
+                "usage": usage,
+                "truncated": completion.choices[0].finish_reason == "length"
+            }
+
+        raise Exception(f"No structured data returned from {model or settings.AI_MODEL}")
+
+    def _openai_messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "You are a medical AI assistant specialized in structuring radiology reports."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def build_batch_requests(
+        self,
+        reports: List[Tuple[int, str]],
+        template_structure: Dict[str, Any]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        (custom id, request parameters) for extracting (report id, text)
+        pairs through the main provider's batch API. Each report is one
+        request with the whole template; the cascade and router don't apply.
+        """
+        response_model = self._create_pydantic_model_from_template(template_structure)
+        if self.provider == "anthropic":
+            json_schema = response_model.model_json_schema()
+            return [
+                (str(report_id), self._anthropic_params(self._build_prompt(text, template_structure), json_schema))
+                for report_id, text in reports
+            ]
+        if self.provider == "openai":
+            response_format = type_to_response_format_param(response_model)
+            return [
+                (str(report_id), {
+                    "model": settings.AI_MODEL,
+                    "messages": self._openai_messages(self._build_prompt(text, template_structure)),
+                    "response_format": response_format,
+                    "temperature": 0.1,
+                    "max_tokens": settings.AI_MAX_TOKENS
+                })
+                for report_id, text in reports
+            ]
+        raise ValueError(f"Batch mode is not supported for provider: {self.provider}")
+
+    def parse_batch_response(
+        self,
+        provider: str,
+        model: str,
+        response: Any,
+        report_text: str,
+        template_structure: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Result of one batch API request, in the shape returned by
+        structure_report. response is an Anthropic message or the body of
+        an OpenAI chat completion.
+        """
+        if provider == "anthropic":
+            result = self._anthropic_result(response)
+        else:
+            choice = response["choices"][0]
+            if not choice["message"].get("content"):
+                raise Exception(f"No structured data returned from {model}")
+            details = response["usage"].get("prompt_tokens_details") or {}
+            result = {
+                "structured_data": json.loads(choice["message"]["content"]),
+                "usage": {
+                    "input_tokens": response["usage"]["prompt_tokens"],
+                    "output_tokens": response["usage"]["completion_tokens"],
+                    "cached_tokens": details.get("cached_tokens") or 0
+                },
+                "truncated": choice["finish_reason"] == "length"
             }
 
-        raise Exception(f"No structured data returned from {self.provider}")
+        result["usage"] = make_usage(provider, model, **result["usage"], batch=True)
+        result["provider"] = provider
+        result["model"] = model
+        result["tier"] = "large"
+        result["escalated"] = False
+        # Batch requests have no meaningful per-report latency
+        result["latency_ms"] = None
+        return self._finish(result, report_text, template_structure)
+
+    async def _call_mock(self, prompt: str, response_model: Type[BaseModel]) -> Dict[str, Any]:
+        """
+        Simulate an LLM call for benchmarking: waits for a log-normally
+        distributed latency and returns an empty result for the template,
+        with token counts estimated at ~4 characters per token
+        """
+        latency = settings.MOCK_LATENCY_MS * random.lognormvariate(0, settings.MOCK_LATENCY_SIGMA)
+        await asyncio.sleep(latency / 1000)
+        structured_data = response_model().model_dump(exclude_none=False)
+        return {
+            "structured_data": structured_data,
+            "usage": {
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(json.dumps(structured_data)) // 4
+            },
+            "truncated": False
+        }
 
     def _parse_response(self, response_text: str) -> Dict[str, Any]:
         """Parse AI response and extract JSON"""
@@ -211,10 +745,7 @@ RESPONSE (JSON only):"""
 
         try:
             structured_data = json.loads(response_text)
-            return {
-                "structured_data": structured_data,
-                "confidence_score": 85  # Could be enhanced with actual confidence scoring
-            }
+            return {"structured_data": structured_data}
         except json.JSONDecodeError as e:
             raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
 
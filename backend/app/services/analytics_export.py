@@ -0,0 +1,139 @@
+"""
+Columnar analytics export of structured reports.
+
+Completed reports are flattened into one column per template field (nested
+sections become `section__field`), using the same nesting rules as the
+Pydantic models built for extraction, and written to Parquet files
+partitioned by template and batch:
+
+    {ANALYTICS_EXPORT_DIR}/template_id=<id>/batch_id=<id>/reports.parquet
+
+Each batch is written once when it finishes, so the dataset grows
+incrementally and analytics queries scan columns instead of JSON blobs.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import ReportBatch, StructuredReport, Template
+from app.services.ai_service import iter_template_fields
+
+COLUMN_SEPARATOR = "__"
+
+REPORT_COLUMNS = [
+    ("report_id", pa.int64()),
+    ("batch_id", pa.int64()),
+    ("template_id", pa.int64()),
+    ("filename", pa.string()),
+    ("confidence_score", pa.int32()),
+    ("is_propagated", pa.bool_()),
+    ("processed_at", pa.timestamp("us", tz="UTC")),
+]
+
+
+def get_template_columns(template_structure: Dict[str, Any]) -> List[Tuple[Tuple[str, ...], str]]:
+    """Return (field path, column name) for every leaf field of the template"""
+    return [
+        (path, COLUMN_SEPARATOR.join(path))
+        for path, is_leaf in iter_template_fields(template_structure)
+        if is_leaf
+    ]
+
+
+def get_export_schema(template_structure: Dict[str, Any]) -> pa.Schema:
+    """Fixed column layout for a template: report metadata followed by its fields"""
+    fields = [pa.field(name, type_) for name, type_ in REPORT_COLUMNS]
+    fields += [pa.field(column, pa.string()) for _, column in get_template_columns(template_structure)]
+    return pa.schema(fields)
+
+
+def field_value(structured_data: Any, path: Tuple[str, ...]) -> Any:
+    value = structured_data
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if value is None or isinstance(value, str):
+        return value
+    # Models occasionally return non-text values; keep them readable
+    return str(value)
+
+
+def _record_batch(
+    reports: Iterable[StructuredReport],
+    columns: List[Tuple[Tuple[str, ...], str]],
+    schema: pa.Schema
+) -> pa.RecordBatch:
+    rows = [
+        {
+            "report_id": report.id,
+            "batch_id": report.batch_id,
+            "template_id": report.template_id,
+            "filename": report.filename,
+            "confidence_score": report.confidence_score,
+            "is_propagated": bool(report.is_propagated),
+            "processed_at": report.processed_at,
+            **{
+                column: field_value(report.structured_data, path)
+                for path, column in columns
+            }
+        }
+        for report in reports
+    ]
+    return pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def get_batch_export_path(template_id: int, batch_id: int) -> str:
+    return os.path.join(
+        settings.ANALYTICS_EXPORT_DIR,
+        f"template_id={template_id}",
+        f"batch_id={batch_id}",
+        "reports.parquet"
+    )
+
+
+def export_batch(db: Session, batch_id: int) -> int:
+    """
+    Write the completed reports of a batch to its Parquet partition,
+    replacing any previous export of that batch. Returns the row count.
+    """
+    batch = db.query(ReportBatch).filter(ReportBatch.id == batch_id).first()
+    if not batch:
+        raise ValueError(f"Batch {batch_id} not found")
+    if batch.archived_at is not None:
+        # Its reports are gone; keep the partition written before archival
+        raise ValueError(f"Batch {batch_id} is archived")
+    template = db.query(Template).filter(Template.id == batch.template_id).first()
+    if not template:
+        raise ValueError(f"Template {batch.template_id} not found")
+
+    columns = get_template_columns(template.structure)
+    schema = get_export_schema(template.structure)
+
+    path = get_batch_export_path(template.id, batch.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    query = db.query(StructuredReport).filter(
+        StructuredReport.batch_id == batch_id,
+        StructuredReport.status == "completed"
+    ).order_by(StructuredReport.id).yield_per(settings.ANALYTICS_EXPORT_CHUNK_SIZE)
+
+    rows = 0
+    chunk: List[StructuredReport] = []
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for report in query:
+            chunk.append(report)
+            if len(chunk) >= settings.ANALYTICS_EXPORT_CHUNK_SIZE:
+                writer.write_batch(_record_batch(chunk, columns, schema))
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_batch(_record_batch(chunk, columns, schema))
+            rows += len(chunk)
+
+    # Readers never see a partially written file
+    os.replace(tmp_path, path)
+    return rows
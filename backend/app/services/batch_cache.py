@@ -0,0 +1,136 @@
+"""
+Short-lived Redis cache of batch status responses.
+
+Dashboards poll the batch endpoints constantly. Serialized batch summaries
+are cached for BATCH_CACHE_TTL_SECONDS together with an ETag derived from
+the fields that change as a batch progresses, so an unchanged poll can be
+answered with 304 without a database query. Workers delete a batch's entry
+(and bump the version of the cached batch lists) whenever they update its
+progress; the TTL bounds staleness if an invalidation races with a refill.
+Redis being unavailable only disables the cache.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+from app.core.config import settings
+from app.core.redis_client import async_redis_client, redis_client
+
+LIST_VERSION_KEY = "batch_cache:list_version"
+
+
+def _summary_key(batch_id: int) -> str:
+    return f"batch_cache:summary:{batch_id}"
+
+
+def _list_key(version: int, skip: int, limit: int) -> str:
+    return f"batch_cache:list:{version}:{skip}:{limit}"
+
+
+def batch_etag(batches: List[Dict[str, Any]]) -> str:
+    """Weak ETag over the progress fields of one or more serialized batches"""
+    state = [
+        (
+            batch["id"],
+            batch["processed_reports"],
+            batch["status"],
+            batch["completed_at"],
+            batch.get("archived_at")
+        )
+        for batch in batches
+    ]
+    return 'W/"' + hashlib.sha1(json.dumps(state).encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+async def _get(key: str) -> Optional[Tuple[Any, str]]:
+    try:
+        cached = await async_redis_client.get(key)
+    except Exception:
+        return None
+    if cached is None:
+        return None
+    entry = json.loads(cached)
+    return entry["data"], entry["etag"]
+
+
+async def _set(key: str, data: Any, etag: str) -> None:
+    try:
+        await async_redis_client.set(
+            key,
+            json.dumps({"data": data, "etag": etag}),
+            ex=settings.BATCH_CACHE_TTL_SECONDS
+        )
+    except Exception:
+        pass
+
+
+async def get_cached_batch(batch_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Cached (summary, etag) for a batch, or None on a miss"""
+    if not settings.BATCH_CACHE_ENABLED:
+        return None
+    return await _get(_summary_key(batch_id))
+
+
+async def cache_batch(batch_id: int, data: Dict[str, Any], etag: str) -> None:
+    if settings.BATCH_CACHE_ENABLED:
+        await _set(_summary_key(batch_id), data, etag)
+
+
+async def _get_list_version() -> Optional[int]:
+    try:
+        return int(await async_redis_client.get(LIST_VERSION_KEY) or 0)
+    except Exception:
+        return None
+
+
+async def get_cached_batch_list(skip: int, limit: int) -> Tuple[Optional[Tuple[List[Dict[str, Any]], str]], Optional[int]]:
+    """
+    Cached (batches, etag) for a page of the batch list, or None on a miss,
+    along with the list version the page should be cached under.
+    """
+    if not settings.BATCH_CACHE_ENABLED:
+        return None, None
+    version = await _get_list_version()
+    if version is None:
+        return None, None
+    return await _get(_list_key(version, skip, limit)), version
+
+
+async def cache_batch_list(version: Optional[int], skip: int, limit: int, data: List[Dict[str, Any]], etag: str) -> None:
+    # The version was read before the query, so a concurrent invalidation
+    # leaves this page under a version nobody reads any more
+    if settings.BATCH_CACHE_ENABLED and version is not None:
+        await _set(_list_key(version, skip, limit), data, etag)
+
+
+async def invalidate_batch_list() -> None:
+    """Drop the cached batch lists after a batch is created (API side)"""
+    if not settings.BATCH_CACHE_ENABLED:
+        return
+    try:
+        await async_redis_client.incr(LIST_VERSION_KEY)
+    except Exception:
+        pass
+
+
+def invalidate_batches(batch_ids: List[int]) -> None:
+    """Drop cached summaries and lists after batch progress changed (worker side)"""
+    if not settings.BATCH_CACHE_ENABLED or not batch_ids:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.delete(*[_summary_key(batch_id) for batch_id in batch_ids])
+        pipe.incr(LIST_VERSION_KEY)
+        pipe.execute()
+    except Exception:
+        # A missed invalidation only costs up to one TTL of staleness
+        pass
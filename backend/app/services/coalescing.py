@@ -0,0 +1,78 @@
+"""
+Singleflight-style coalescing of identical concurrent extractions.
+
+The first caller for a key takes a Redis lock and runs the computation;
+concurrent callers with the same key poll until the leader's result
+appears and return it instead of calling the LLM themselves. The result is
+kept for COALESCE_RESULT_TTL_SECONDS so retries arriving just after the
+leader finished are also served. If the leader fails, its lock is released
+and the next waiter takes over. Redis being unavailable disables coalescing
+rather than failing the extraction.
+"""
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import json
+import time
+from redis.exceptions import LockError, RedisError
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+
+def _get_cached(result_key: str):
+    cached = redis_client.get(result_key)
+    if cached is None:
+        return None
+    return {**json.loads(cached), "coalesced": True}
+
+
+async def singleflight(
+    key: str,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Run compute() once per key across all workers and share the result"""
+    result_key = f"singleflight:result:{key}"
+    lock = redis_client.lock(
+        f"singleflight:lock:{key}",
+        timeout=settings.COALESCE_LOCK_TTL_SECONDS
+    )
+    deadline = time.monotonic() + settings.COALESCE_LOCK_TTL_SECONDS
+    acquired = False
+
+    try:
+        while True:
+            cached = _get_cached(result_key)
+            if cached is not None:
+                return cached
+            if lock.acquire(blocking=False):
+                acquired = True
+                # The previous leader may have finished since we last looked
+                cached = _get_cached(result_key)
+                if cached is not None:
+                    lock.release()
+                    return cached
+                break
+            if time.monotonic() > deadline:
+                # Leader is stuck; stop waiting and compute without the lock
+                break
+            await asyncio.sleep(settings.COALESCE_POLL_INTERVAL_MS / 1000)
+    except RedisError:
+        return await compute()
+
+    try:
+        result = await compute()
+        if acquired:
+            try:
+                redis_client.set(
+                    result_key,
+                    json.dumps(result),
+                    ex=settings.COALESCE_RESULT_TTL_SECONDS
+                )
+            except RedisError:
+                pass
+        return result
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except (LockError, RedisError):
+                pass
@@ -0,0 +1,80 @@
+"""
+Near-duplicate report detection.
+
+Reports are normalized (dates, times, labelled identifiers such as
+accession numbers, punctuation and whitespace masked) and reduced to a
+content key. Reports with the same key under the same template are
+grouped, and only one representative per group is sent to the LLM.
+
+Grouping is deliberately exact on the remaining words: in a long report a
+one-word negation flip ("no pneumothorax" vs "pneumothorax") or a changed
+measurement barely moves any similarity score, so a similarity threshold
+can't tell such reports apart from true boilerplate duplicates.
+
+The key is stored with each report, so a report is also grouped with
+matching reports of the same template from earlier uploads (e.g. a
+message resent by the HL7 interface): it takes over a completed result
+directly, or waits for a representative that is still being processed.
+"""
+from typing import Dict, List, Optional
+import hashlib
+import re
+
+# Dates with a consistent separator and a four-digit year (03/12/2024,
+# 2024-03-12). Measurement ranges such as 3.5-4.0 never match.
+_DATE_RE = re.compile(
+    r"\b(?:\d{1,2}([/.-])\d{1,2}\1(?:19|20)\d{2}|(?:19|20)\d{2}([/.-])\d{1,2}\2\d{1,2})\b"
+)
+# Clock times: hh:mm with a two-digit hour, or with am/pm (not ratios like 1:10)
+_TIME_RE = re.compile(
+    r"\b(?:(?:[01]?\d|2[0-3]):[0-5]\d(?::[0-5]\d)?\s*[ap]\.?m\b\.?"
+    r"|(?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d)?\b)"
+)
+# Accession numbers, MRNs and similar identifiers, only after their label;
+# bare numbers (doses, counts) are never masked
+_IDENTIFIER_RE = re.compile(
+    r"\b(accession|acc|mrn|medical record|patient id|study id|exam id|order)"
+    r"(\s*(?:no\.?|number|#)?\s*[:#]?\s*)"
+    r"[a-z0-9][a-z0-9-]*\d[a-z0-9-]*\b"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s<>]")
+_MASK_TOKENS = {"<date>", "<time>", "<id>"}
+
+
+def normalize_report_text(text: str) -> str:
+    """Strip the parts of a report that vary between otherwise identical studies"""
+    text = text.lower()
+    text = _DATE_RE.sub(" <date> ", text)
+    text = _TIME_RE.sub(" <time> ", text)
+    text = _IDENTIFIER_RE.sub(r"\1\2 <id> ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def content_words(normalized: str) -> List[str]:
+    """Words of normalized text, without punctuation and masked tokens"""
+    return [
+        word for word in _PUNCTUATION_RE.sub(" ", normalized).split()
+        if word not in _MASK_TOKENS
+    ]
+
+
+def content_key(text: str) -> str:
+    """Key shared by reports that only differ in masked parts and punctuation"""
+    words = content_words(normalize_report_text(text))
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def find_near_duplicates(keys: List[str]) -> List[Optional[int]]:
+    """
+    Group reports of one upload by content key.
+    Returns, for each key, the index of the first earlier report with the
+    same key, or None if the report is the first of its group.
+    """
+    first: Dict[str, int] = {}
+    clusters: List[Optional[int]] = []
+    for idx, key in enumerate(keys):
+        clusters.append(first.get(key))
+        first.setdefault(key, idx)
+    return clusters
+
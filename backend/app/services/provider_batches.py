@@ -0,0 +1,165 @@
+"""
+Extraction through the providers' asynchronous batch APIs.
+
+Large uploads (AI_BATCH_MODE_MIN_REPORTS reports or more) can be sent to
+Anthropic Message Batches or the OpenAI Batch API instead of one
+synchronous call per report task. The batch's pending reports are submitted
+in chunks of AI_BATCH_CHUNK_SIZE requests; each chunk is recorded as a
+ProviderBatch and its reports are marked "submitted". A periodic task
+fetches the results of finished provider batches and writes them back in
+bulk (see app.tasks.provider_batch_tasks).
+
+Each report is one request extracting the whole template with the main
+model. Reports long enough to need chunking, and requests the provider
+reports as errored, expired or canceled, are processed individually by the
+workers instead. Near-duplicates are not submitted; they receive their
+representative's result as usual.
+
+AI_BATCH_BASE_URL points the batch clients at another endpoint, such as
+the local fake_batch_server.py.
+"""
+from typing import Any, Iterator, List, Optional, Tuple
+import json
+from anthropic import Anthropic
+from openai import OpenAI
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import ProviderBatch, ReportBatch, StructuredReport, Template
+from app.services.ai_service import ai_service
+
+BATCH_PROVIDERS = ["anthropic", "openai"]
+
+# OpenAI batch states after which no more results will be produced
+OPENAI_FINAL_STATES = ["completed", "failed", "expired", "cancelled"]
+
+
+def uses_provider_batches(report_count: int) -> bool:
+    """Whether an upload of this size is extracted through the batch API"""
+    return (
+        settings.AI_BATCH_MODE_ENABLED
+        and ai_service.provider in BATCH_PROVIDERS
+        and report_count >= settings.AI_BATCH_MODE_MIN_REPORTS
+    )
+
+
+def get_batch_client(provider: str) -> Any:
+    if provider == "anthropic":
+        return Anthropic(api_key=settings.ANTHROPIC_API_KEY, base_url=settings.AI_BATCH_BASE_URL)
+    if provider == "openai":
+        base_url = f"{settings.AI_BATCH_BASE_URL}/v1" if settings.AI_BATCH_BASE_URL else None
+        return OpenAI(api_key=settings.OPENAI_API_KEY, base_url=base_url)
+    raise ValueError(f"Batch mode is not supported for provider: {provider}")
+
+
+def _needs_chunking(report_text: str) -> bool:
+    return settings.AI_CHUNK_ENABLED and len(report_text) > settings.AI_CHUNK_THRESHOLD_CHARS
+
+
+def _create(client: Any, provider: str, requests: List[Tuple[str, Any]]) -> str:
+    """Submit requests as one provider batch and return its id"""
+    if provider == "anthropic":
+        batch = client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": params}
+            for custom_id, params in requests
+        ])
+        return batch.id
+
+    lines = "\n".join(
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for custom_id, body in requests
+    )
+    input_file = client.files.create(file=("reports.jsonl", lines.encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def submit_reports(db: Session, batch_id: int) -> int:
+    """
+    Submit the batch's pending reports in chunks, committing after each
+    chunk. Returns the number of submitted reports; reports that have to be
+    processed individually are left pending.
+    """
+    batch = db.query(ReportBatch).filter(ReportBatch.id == batch_id).first()
+    if not batch:
+        raise ValueError(f"Batch {batch_id} not found")
+    template = db.query(Template).filter(Template.id == batch.template_id).first()
+    if not template:
+        raise ValueError(f"Template {batch.template_id} not found")
+
+    provider = ai_service.provider
+    client = get_batch_client(provider)
+    submitted = 0
+    last_id = 0
+    while True:
+        reports = db.query(StructuredReport.id, StructuredReport.original_text).filter(
+            StructuredReport.batch_id == batch_id,
+            StructuredReport.status == "pending",
+            StructuredReport.duplicate_of_id.is_(None),
+            StructuredReport.id > last_id
+        ).order_by(StructuredReport.id).limit(settings.AI_BATCH_CHUNK_SIZE).all()
+        if not reports:
+            break
+        last_id = reports[-1].id
+
+        reports = [(report_id, text) for report_id, text in reports if not _needs_chunking(text)]
+        if not reports:
+            continue
+
+        requests = ai_service.build_batch_requests(reports, template.structure)
+        provider_batch = ProviderBatch(
+            batch_id=batch_id,
+            provider=provider,
+            model=settings.AI_MODEL,
+            external_id=_create(client, provider, requests),
+            status="submitted",
+            request_count=len(requests)
+        )
+        db.add(provider_batch)
+        db.flush()
+
+        db.query(StructuredReport).filter(
+            StructuredReport.batch_id == batch_id,
+            StructuredReport.id.in_([report_id for report_id, _ in reports])
+        ).update(
+            {"status": "submitted", "provider_batch_id": provider_batch.id},
+            synchronize_session=False
+        )
+        batch.status = "processing"
+        # The provider batch exists now; record it even if a later chunk fails
+        db.commit()
+        submitted += len(requests)
+    return submitted
+
+
+def fetch_results(provider_batch: ProviderBatch) -> Optional[Iterator[Tuple[int, Any]]]:
+    """
+    (report id, response) for every successful request of a finished
+    provider batch, or None while it is still running. Failed requests are
+    left out.
+    """
+    client = get_batch_client(provider_batch.provider)
+    if provider_batch.provider == "anthropic":
+        batch = client.messages.batches.retrieve(provider_batch.external_id)
+        if batch.processing_status != "ended":
+            return None
+        return (
+            (int(item.custom_id), item.result.message)
+            for item in client.messages.batches.results(provider_batch.external_id)
+            if item.result.type == "succeeded"
+        )
+
+    batch = client.batches.retrieve(provider_batch.external_id)
+    if batch.status not in OPENAI_FINAL_STATES:
+        return None
+    if not batch.output_file_id:
+        return iter([])
+    lines = client.files.content(batch.output_file_id).text.splitlines()
+    return (
+        (int(item["custom_id"]), item["response"]["body"])
+        for item in map(json.loads, filter(None, lines))
+        if item.get("response") and item["response"]["status_code"] == 200
+    )
@@ -0,0 +1,136 @@
+"""
+Latency-aware routing of extractions across LLM providers.
+
+AI_ROUTER_PROVIDERS lists the routes as provider:model[:weight] entries,
+e.g. "anthropic:claude-sonnet-4-20250514:2,openai:gpt-4o,ollama:gemma3".
+Each worker process keeps the recent latency and error rate of every route.
+A request goes to a healthy route picked with probability proportional to
+weight / (mean latency * (1 + error rate)), so faster routes get most of the
+traffic while the others keep being measured. If the call fails, the
+remaining routes are tried from best to worst score.
+
+A route whose error rate over the window reaches AI_ROUTER_ERROR_THRESHOLD
+is taken out of rotation for AI_ROUTER_COOLDOWN_SECONDS. It then gets trial
+requests again, and its history is reset on the first success.
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple, TypeVar
+import random
+import time
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Outcomes needed before a route can be taken out of rotation
+MIN_SAMPLES = 5
+
+
+class Route:
+    def __init__(self, provider: str, model: str, client: Any, weight: float = 1.0):
+        self.provider = provider
+        self.model = model
+        self.client = client
+        self.weight = weight
+        self.latencies: Deque[float] = deque(maxlen=settings.AI_ROUTER_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=settings.AI_ROUTER_WINDOW)
+        self.opened_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def latency_ms(self) -> float:
+        if not self.latencies:
+            # Unmeasured routes look fast so they get tried
+            return settings.AI_ROUTER_DEFAULT_LATENCY_MS
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def healthy(self) -> bool:
+        return self.opened_at is None or time.monotonic() - self.opened_at >= settings.AI_ROUTER_COOLDOWN_SECONDS
+
+    @property
+    def score(self) -> float:
+        return self.weight / (self.latency_ms * (1 + self.error_rate))
+
+    def record_success(self, latency_ms: float):
+        if self.opened_at is not None:
+            # Recovered: forget the failures that opened the route
+            self.opened_at = None
+            self.outcomes.clear()
+        self.latencies.append(latency_ms)
+        self.outcomes.append(True)
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        if len(self.outcomes) >= MIN_SAMPLES and self.error_rate >= settings.AI_ROUTER_ERROR_THRESHOLD:
+            self.opened_at = time.monotonic()
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_routes(spec: str) -> List[Tuple[str, str, float]]:
+    """
+    Parse provider:model[:weight] entries. Model names may contain colons
+    (e.g. ollama:llama3:8b); a numeric last part is taken as the weight.
+    """
+    routes = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        parts = entry.strip().split(":")
+        if len(parts) > 2 and _is_number(parts[-1]):
+            weight = float(parts.pop())
+        else:
+            weight = 1.0
+        provider, model = parts[0].strip().lower(), ":".join(parts[1:]).strip()
+        if not provider or not model:
+            raise ValueError(f"Invalid AI_ROUTER_PROVIDERS entry: {entry}")
+        routes.append((provider, model, weight))
+    return routes
+
+
+class ProviderRouter:
+    def __init__(self, routes: List[Route]):
+        if not routes:
+            raise ValueError("AI router has no providers configured")
+        self.routes = routes
+
+    def plan(self) -> List[Route]:
+        """Routes in the order to try them for one request"""
+        healthy = [route for route in self.routes if route.healthy]
+        if not healthy:
+            # Everything is out of rotation; try the longest-closed routes first
+            return sorted(self.routes, key=lambda route: route.opened_at or 0)
+
+        first = random.choices(healthy, weights=[route.score for route in healthy])[0]
+        rest = sorted((route for route in healthy if route is not first), key=lambda route: -route.score)
+        return [first] + rest
+
+    async def call(self, fn: Callable[[Route], Awaitable[T]]) -> Tuple[T, Route]:
+        """Run fn on the best route, failing over to the others on errors"""
+        errors = []
+        for route in self.plan():
+            start = time.perf_counter()
+            try:
+                result = await fn(route)
+            except Exception as e:
+                route.record_failure()
+                errors.append(f"{route.name}: {str(e)}")
+                continue
+            route.record_success((time.perf_counter() - start) * 1000)
+            return result, route
+        raise Exception(f"All providers failed ({'; '.join(errors)})")
@@ -0,0 +1,176 @@
+"""
+Section-aware chunking of long reports and merging of per-chunk extractions.
+
+Reports longer than AI_CHUNK_THRESHOLD_CHARS are split on section headings
+(FINDINGS:, IMPRESSION:, ADDENDUM, ...) into chunks of at most
+AI_CHUNK_MAX_CHARS, each extracted against the full template. The partial
+results are then reduced field by field with deterministic rules, so the
+same chunk results always merge to the same structured_data.
+
+A template field can choose its rule with an optional "merge" key:
+"concat" (default) joins the distinct non-empty values in report order,
+"first" keeps the earliest value and "last" the latest one (e.g. for
+fields an addendum should override).
+"""
+from typing import Any, Callable, Dict, List, Optional
+import re
+
+# Upper-case heading at the start of a line, ending in a colon or the line
+_SECTION_RE = re.compile(r"^[ \t]*[A-Z][A-Z0-9 /&(),\-]{1,48}(?::|[ \t]*$)", re.MULTILINE)
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# A chunk shorter than max_chars // MIN_CHUNK_DIVISOR is never sent alone:
+# the next piece is split to fill it up, even if that piece fits a chunk
+MIN_CHUNK_DIVISOR = 10
+
+def split_sections(text: str) -> List[str]:
+    """Split a report into its sections, keeping any preamble as the first one"""
+    starts = [match.start() for match in _SECTION_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    sections = [text[start:end] for start, end in zip(starts, starts[1:])]
+    return [section for section in sections if section.strip()]
+
+
+def _split_oversized(section: str, max_chars: int, first_max: Optional[int] = None) -> List[str]:
+    """
+    Split a section longer than max_chars on paragraphs, lines, then words.
+    The first piece is at most first_max (default max_chars) long.
+    """
+    first_max = max_chars if first_max is None else first_max
+    paragraphs = [piece for piece in _PARAGRAPH_RE.split(section) if piece.strip()]
+    if len(paragraphs) > 1:
+        return _pack(paragraphs, max_chars, "\n\n", first_max=first_max)
+    lines = [line for line in section.split("\n") if line.strip()]
+    if len(lines) > 1:
+        return _pack(lines, max_chars, "\n", first_max=first_max)
+
+    pieces = []
+    limit = first_max
+    while len(section) > limit:
+        cut = section.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        pieces.append(section[:cut])
+        section = section[cut:].lstrip()
+        limit = max_chars
+    return pieces + [section] if section else pieces
+
+
+def _pack(
+    pieces: List[str],
+    max_chars: int,
+    joiner: str,
+    split: Callable[[str, int, int], List[str]] = _split_oversized,
+    first_max: Optional[int] = None
+) -> List[str]:
+    """
+    Greedily join consecutive pieces into chunks of at most max_chars
+    (first_max for the first chunk). A piece that doesn't fit starts a new
+    chunk, unless it is too long for one and the current chunk is at most
+    half full, or the current chunk is below the minimum size: then the
+    piece is split and its first part fills the current chunk, so short
+    sections don't end up as chunks of their own.
+    """
+    chunks: List[str] = []
+    current = ""
+    limit = max_chars if first_max is None else first_max
+    for piece in pieces:
+        room = limit - len(current) - len(joiner) if current else limit
+        if len(piece) <= room:
+            current = current + joiner + piece if current else piece
+            continue
+        too_short = len(current) < max_chars // MIN_CHUNK_DIVISOR
+        if current and ((len(piece) <= max_chars and not too_short) or len(current) > limit // 2):
+            chunks.append(current)
+            current = ""
+            limit = room = max_chars
+            if len(piece) <= room:
+                current = piece
+                continue
+
+        parts = split(piece, max_chars, room)
+        if current:
+            parts[0] = current + joiner + parts[0]
+        chunks.extend(parts[:-1])
+        current = parts[-1]
+        limit = max_chars
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_section(section: str, max_chars: int, first_max: Optional[int] = None) -> List[str]:
+    """
+    Split a section longer than max_chars (or first_max for the first
+    piece), keeping its heading with the first piece of its body
+    """
+    first_max = max_chars if first_max is None else first_max
+    heading = _SECTION_RE.match(section)
+    if heading is None:
+        return _split_oversized(section, max_chars, first_max)
+    rest = section[heading.end():]
+    body = rest.lstrip()
+    prefix = section[:len(section) - len(body)]
+    if not body or len(prefix) > first_max // 2:
+        return _split_oversized(section, max_chars, first_max)
+
+    pieces = _split_oversized(body, max_chars - len(prefix), first_max - len(prefix))
+    return [prefix + pieces[0]] + pieces[1:]
+
+
+def chunk_report(text: str, max_chars: int) -> List[str]:
+    """Group consecutive sections into chunks of at most max_chars"""
+    sections = [section.strip("\n") for section in split_sections(text)]
+    return _pack(sections, max_chars, "\n", split=_split_section)
+
+
+def _is_leaf(spec: Any) -> bool:
+    return not isinstance(spec, dict) or ("type" in spec and "description" in spec)
+
+
+def _merge_leaf(values: List[Any], spec: Any) -> Optional[Any]:
+    values = [value for value in values if value is not None and str(value).strip()]
+    if not values:
+        return None
+
+    rule = spec.get("merge", "concat") if isinstance(spec, dict) else "concat"
+    if rule == "first":
+        return values[0]
+    if rule == "last":
+        return values[-1]
+
+    distinct: List[str] = []
+    seen = set()
+    for value in values:
+        key = _WHITESPACE_RE.sub(" ", str(value)).strip().lower()
+        if key not in seen:
+            seen.add(key)
+            distinct.append(str(value).strip())
+    return "\n".join(distinct)
+
+
+def _merge_node(values: List[Any], spec: Any) -> Optional[Any]:
+    if _is_leaf(spec):
+        return _merge_leaf(values, spec)
+
+    merged = {
+        key: _merge_node([value.get(key) if isinstance(value, dict) else None for value in values], child)
+        for key, child in spec.items()
+    }
+    if all(value is None for value in merged.values()):
+        return None
+    return merged
+
+
+def merge_extractions(
+    results: List[Dict[str, Any]],
+    template_structure: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Reduce per-chunk structured_data (in report order) into one result"""
+    return {
+        key: _merge_node([result.get(key) if isinstance(result, dict) else None for result in results], spec)
+        for key, spec in template_structure.items()
+    }
@@ -0,0 +1,252 @@
+"""
+Partition management, archival and bulk deletion of structured reports.
+
+On Postgres, structured_reports is range-partitioned by batch_id with
+REPORT_PARTITION_BATCH_SPAN batches per partition, so all reports of a
+batch live in one partition and batch ids (which grow over time) keep the
+partitions roughly time-ordered. A batch's partition is created when the
+batch is created. When the last live batch of a partition is archived or
+deleted, the whole partition is dropped instead of deleting its rows.
+Databases whose table isn't partitioned (SQLite, or Postgres tables created
+before partitioning) fall back to a single bulk DELETE.
+
+Archival writes all report columns of a completed batch to
+{REPORT_ARCHIVE_DIR}/batch_id=<id>/reports.parquet (zstd), removes the rows
+and marks the batch archived. The batch row, with its counts and tier
+stats, stays queryable, and its reports are served from the archive file.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, DateTime, Float, Integer, JSON, delete, func, text
+from sqlalchemy.orm import Session, undefer
+from app.core.config import settings
+from app.core.database import engine
+from app.models.models import ProviderBatch, ReportBatch, StructuredReport
+from app.services.analytics_export import get_batch_export_path
+
+_partitioned: Optional[bool] = None
+
+
+def is_partitioned() -> bool:
+    """Whether the structured_reports table in the database is partitioned"""
+    global _partitioned
+    if _partitioned is None:
+        if engine.dialect.name != "postgresql":
+            _partitioned = False
+        else:
+            with engine.connect() as conn:
+                relkind = conn.execute(
+                    text("SELECT relkind FROM pg_class WHERE oid = to_regclass('structured_reports')")
+                ).scalar()
+            _partitioned = relkind == "p"
+    return _partitioned
+
+
+def partition_bounds(batch_id: int) -> Tuple[int, int]:
+    span = settings.REPORT_PARTITION_BATCH_SPAN
+    lower = batch_id // span * span
+    return lower, lower + span
+
+
+def partition_name(batch_id: int) -> str:
+    return f"structured_reports_b{partition_bounds(batch_id)[0]}"
+
+
+def ensure_partition(batch_id: int) -> None:
+    """
+    Create the partition holding a batch's reports if it doesn't exist.
+    Runs in its own short transaction, since creating a partition locks the
+    parent table.
+    """
+    if not is_partitioned():
+        return
+    name = partition_name(batch_id)
+    lower, upper = partition_bounds(batch_id)
+    with engine.begin() as conn:
+        if conn.execute(text(f"SELECT to_regclass('{name}')")).scalar() is not None:
+            return
+        # Serialize concurrent creators of the same partition
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('structured_reports_partitions'))"))
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF structured_reports "
+            f"FOR VALUES FROM ({lower}) TO ({upper})"
+        ))
+
+
+def release_reports(db: Session, batch_ids: List[int]) -> None:
+    """
+    Remove all reports of the given batches (in the caller's transaction),
+    dropping partitions that are left empty
+    """
+    if not batch_ids:
+        return
+    if not is_partitioned():
+        db.execute(delete(StructuredReport).where(StructuredReport.batch_id.in_(batch_ids)))
+        return
+
+    # New batches only ever get ids above the current maximum, so only
+    # partitions entirely below it can be dropped safely
+    max_batch_id = db.query(func.max(ReportBatch.id)).scalar() or 0
+
+    by_partition: Dict[str, List[int]] = defaultdict(list)
+    for batch_id in batch_ids:
+        by_partition[partition_name(batch_id)].append(batch_id)
+
+    for name, ids in by_partition.items():
+        if db.execute(text(f"SELECT to_regclass('{name}')")).scalar() is None:
+            continue
+        lower, upper = partition_bounds(ids[0])
+        others = db.execute(
+            text(f"SELECT 1 FROM {name} WHERE batch_id <> ALL(:ids) LIMIT 1"),
+            {"ids": ids}
+        ).first()
+        # Other live batches of the partition may not have inserted their
+        # reports yet, e.g. an upload still inside create_batch
+        other_batches = db.query(ReportBatch.id).filter(
+            ReportBatch.id >= lower,
+            ReportBatch.id < upper,
+            ReportBatch.id.notin_(ids),
+            ReportBatch.archived_at.is_(None)
+        ).first()
+        if others is None and other_batches is None and upper <= max_batch_id + 1:
+            db.execute(text(f"DROP TABLE {name}"))
+        else:
+            db.execute(delete(StructuredReport).where(StructuredReport.batch_id.in_(ids)))
+
+
+def delete_batches(db: Session, batch_ids: List[int]) -> List[str]:
+    """
+    Delete batches with their reports (in the caller's transaction).
+    Returns the directories of their archives and analytics exports, to be
+    removed with remove_batch_files once the transaction is committed.
+    """
+    batches = db.query(ReportBatch.id, ReportBatch.template_id, ReportBatch.archive_path).filter(
+        ReportBatch.id.in_(batch_ids)
+    ).all()
+    release_reports(db, batch_ids)
+    db.execute(delete(ProviderBatch).where(ProviderBatch.batch_id.in_(batch_ids)))
+    db.execute(delete(ReportBatch).where(ReportBatch.id.in_(batch_ids)))
+
+    paths = []
+    for batch in batches:
+        if batch.archive_path:
+            paths.append(os.path.dirname(batch.archive_path))
+        paths.append(os.path.dirname(get_batch_export_path(batch.template_id, batch.id)))
+    return paths
+
+
+def remove_batch_files(paths: List[str]) -> None:
+    """Remove directories returned by delete_batches"""
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _arrow_type(column) -> pa.DataType:
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    # Text columns, and JSON stored as its serialized text
+    return pa.string()
+
+
+def get_archive_schema() -> pa.Schema:
+    return pa.schema([
+        pa.field(column.name, _arrow_type(column))
+        for column in StructuredReport.__table__.columns
+    ])
+
+
+def _archive_row(report: StructuredReport) -> Dict[str, Any]:
+    row = {}
+    for column in StructuredReport.__table__.columns:
+        value = getattr(report, column.key)
+        if isinstance(column.type, JSON) and value is not None:
+            value = json.dumps(value)
+        row[column.name] = value
+    return row
+
+
+def get_archive_path(batch_id: int) -> str:
+    return os.path.join(settings.REPORT_ARCHIVE_DIR, f"batch_id={batch_id}", "reports.parquet")
+
+
+def archive_batch(db: Session, batch: ReportBatch) -> int:
+    """
+    Move a batch's reports to its archive file (committed by the caller).
+    Returns the number of archived reports.
+    """
+    path = get_archive_path(batch.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    schema = get_archive_schema()
+
+    query = db.query(StructuredReport).options(
+        undefer(StructuredReport.original_text)
+    ).filter(
+        StructuredReport.batch_id == batch.id
+    ).order_by(StructuredReport.id).yield_per(settings.ANALYTICS_EXPORT_CHUNK_SIZE)
+
+    rows = 0
+    chunk: List[Dict[str, Any]] = []
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for report in query:
+            chunk.append(_archive_row(report))
+            if len(chunk) >= settings.ANALYTICS_EXPORT_CHUNK_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+            rows += len(chunk)
+    os.replace(tmp_path, path)
+
+    release_reports(db, [batch.id])
+    batch.archived_at = datetime.utcnow()
+    batch.archive_path = path
+    return rows
+
+
+def archive_old_batches(db: Session) -> List[int]:
+    """Archive completed batches older than the retention window, oldest first"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.REPORT_RETENTION_DAYS)
+    batches = db.query(ReportBatch).filter(
+        ReportBatch.status == "completed",
+        ReportBatch.completed_at < cutoff,
+        ReportBatch.archived_at.is_(None)
+    ).order_by(ReportBatch.id).all()
+
+    archived = []
+    for batch in batches:
+        archive_batch(db, batch)
+        # Commit per batch so progress survives a failure further on
+        db.commit()
+        archived.append(batch.id)
+    return archived
+
+
+def read_archived_reports(path: str, include_text: bool = True) -> List[Dict[str, Any]]:
+    """Reports of an archived batch, in the shape of StructuredReport rows"""
+    json_columns = [
+        column.name for column in StructuredReport.__table__.columns
+        if isinstance(column.type, JSON)
+    ]
+    columns = None
+    if not include_text:
+        columns = [name for name in pq.read_schema(path).names if name != "original_text"]
+    rows = pq.read_table(path, columns=columns).to_pylist()
+    for row in rows:
+        for name in json_columns:
+            if row.get(name) is not None:
+                row[name] = json.loads(row[name])
+    return rows
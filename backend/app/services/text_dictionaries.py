@@ -0,0 +1,74 @@
+"""
+Per-template zstd dictionaries for report text compression.
+
+The first upload for a template with at least REPORT_DICTIONARY_MIN_SAMPLES
+reports trains a dictionary from a sample of its texts. The dictionary is
+stored in text_dictionaries and used to compress all later uploads of the
+template; frames keep the id of the dictionary they were compressed with,
+so a retrained dictionary never affects existing rows.
+"""
+from typing import List, Optional
+import random
+import zstandard
+from sqlalchemy.orm import Session
+from app.core.compression import compress_text, register_dictionary
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import TextDictionary
+
+
+def train_dictionary(texts: List[str]) -> Optional[zstandard.ZstdCompressionDict]:
+    """Dictionary trained on a sample of the texts, or None if training fails"""
+    samples = random.sample(texts, min(len(texts), settings.REPORT_DICTIONARY_MAX_SAMPLES))
+    try:
+        return zstandard.train_dictionary(
+            settings.REPORT_DICTIONARY_SIZE,
+            [sample.encode("utf-8") for sample in samples]
+        )
+    except zstandard.ZstdError:
+        # Too little or too uniform sample data
+        return None
+
+
+def save_dictionary(db: Session, template_id: int, dictionary: zstandard.ZstdCompressionDict, sample_count: int) -> int:
+    """Make a dictionary the template's current one; returns its zstd dictionary id"""
+    db.add(TextDictionary(
+        template_id=template_id,
+        dict_id=dictionary.dict_id(),
+        data=dictionary.as_bytes(),
+        sample_count=sample_count
+    ))
+    db.commit()
+    register_dictionary(dictionary)
+    return dictionary.dict_id()
+
+
+def get_template_dictionary(db: Session, template_id: int, texts: List[str]) -> int:
+    """
+    zstd dictionary id for compressing a template's reports (0 for none),
+    training one from the given texts if the template has none yet
+    """
+    if not settings.REPORT_DICTIONARY_ENABLED:
+        return 0
+    current = db.query(TextDictionary.dict_id).filter(
+        TextDictionary.template_id == template_id
+    ).order_by(TextDictionary.id.desc()).first()
+    if current:
+        return current.dict_id
+    if len(texts) < settings.REPORT_DICTIONARY_MIN_SAMPLES:
+        return 0
+
+    dictionary = train_dictionary(texts)
+    if dictionary is None:
+        return 0
+    return save_dictionary(db, template_id, dictionary, min(len(texts), settings.REPORT_DICTIONARY_MAX_SAMPLES))
+
+
+def compress_report_texts(template_id: int, texts: List[str]) -> List[bytes]:
+    """Compress an upload's report texts with the template's dictionary"""
+    db = SessionLocal()
+    try:
+        dict_id = get_template_dictionary(db, template_id, texts)
+    finally:
+        db.close()
+    return [compress_text(report_text, dict_id) for report_text in texts]
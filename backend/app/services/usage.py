@@ -0,0 +1,121 @@
+"""
+Token usage and cost accounting for LLM calls.
+
+Every provider call reports its input, output and cached input tokens.
+Costs are computed per call from per-million-token prices, so a report
+whose extraction spans several models (cascade, router failover) is priced
+correctly. Prices come from DEFAULT_PRICING, overridden or extended by the
+AI_PRICING setting, e.g. AI_PRICING='{"gpt-4o": [2.5, 10, 1.25]}'.
+Local providers are free. Calls to models without a price have no cost.
+Requests made through the providers' batch APIs are billed at half price.
+"""
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import StructuredReport
+
+# USD per million tokens: [input, output, cached input]
+DEFAULT_PRICING = {
+    "claude-sonnet-4-20250514": [3.0, 15.0, 0.30],
+    "claude-3-5-sonnet-20241022": [3.0, 15.0, 0.30],
+    "claude-3-5-haiku-20241022": [0.80, 4.0, 0.08],
+    "gpt-4o": [2.50, 10.0, 1.25],
+    "gpt-4o-mini": [0.15, 0.60, 0.075],
+    "gpt-4-turbo-preview": [10.0, 30.0, 10.0],
+}
+
+FREE_PROVIDERS = ["ollama", "mock"]
+
+# Price multiplier for requests made through a provider batch API
+BATCH_PRICE_FACTOR = 0.5
+
+USAGE_GROUPS = {
+    "batch": StructuredReport.batch_id,
+    "template": StructuredReport.template_id,
+    "model": StructuredReport.model,
+}
+
+
+def get_price(provider: str, model: str) -> Optional[List[float]]:
+    if provider in FREE_PROVIDERS:
+        return [0.0, 0.0, 0.0]
+    return settings.AI_PRICING.get(model) or DEFAULT_PRICING.get(model)
+
+
+def make_usage(
+    provider: str,
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cached_tokens: int = 0,
+    batch: bool = False
+) -> Dict[str, Any]:
+    """Usage of one call, priced for its model (batch: made through a batch API)"""
+    price = get_price(provider, model)
+    cost = None
+    if price is not None:
+        # Cached tokens are part of the input but billed at the cached rate
+        cost = (
+            (input_tokens - cached_tokens) * price[0]
+            + output_tokens * price[1]
+            + cached_tokens * price[2]
+        ) / 1_000_000
+        if batch:
+            cost *= BATCH_PRICE_FACTOR
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+        "cost_usd": cost,
+        "calls": 1,
+    }
+
+
+def sum_usage(usages: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Total of several calls' usage; the cost is unknown if any part is"""
+    usages = [usage for usage in usages if usage]
+    costs = [usage["cost_usd"] for usage in usages]
+    return {
+        "input_tokens": sum(usage["input_tokens"] for usage in usages),
+        "output_tokens": sum(usage["output_tokens"] for usage in usages),
+        "cached_tokens": sum(usage["cached_tokens"] for usage in usages),
+        "cost_usd": None if None in costs else sum(costs),
+        "calls": sum(usage["calls"] for usage in usages),
+    }
+
+
+async def get_usage_rollup(
+    db: AsyncSession,
+    group_by: str,
+    batch_id: Optional[int] = None,
+    template_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Token, cost and latency totals of the reports that made LLM calls,
+    grouped by batch, template or model, most expensive first
+    """
+    key = USAGE_GROUPS[group_by]
+    query = select(
+        key.label("key"),
+        func.count(StructuredReport.id).label("reports"),
+        func.sum(StructuredReport.llm_calls).label("llm_calls"),
+        func.sum(StructuredReport.input_tokens).label("input_tokens"),
+        func.sum(StructuredReport.output_tokens).label("output_tokens"),
+        func.sum(StructuredReport.cached_tokens).label("cached_tokens"),
+        func.sum(StructuredReport.cost_usd).label("cost_usd"),
+        func.avg(StructuredReport.latency_ms).label("avg_latency_ms"),
+        func.max(StructuredReport.latency_ms).label("max_latency_ms"),
+        func.avg(StructuredReport.text_length).label("avg_report_chars"),
+    ).filter(StructuredReport.llm_calls.isnot(None)).group_by(key)
+
+    if batch_id is not None:
+        query = query.filter(StructuredReport.batch_id == batch_id)
+    if template_id is not None:
+        query = query.filter(StructuredReport.template_id == template_id)
+
+    rows = (await db.execute(query)).mappings().all()
+    return sorted(
+        [{"group_by": group_by, **row} for row in rows],
+        key=lambda row: (row["cost_usd"] is None, -(row["cost_usd"] or 0), -(row["avg_latency_ms"] or 0))
+    )
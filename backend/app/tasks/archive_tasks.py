@@ -0,0 +1,22 @@
+from app.celery_app import celery_app
+from app.core.database import SessionLocal
+from app.services.batch_cache import invalidate_batches
+from app.services.report_storage import archive_old_batches
+
+
+@celery_app.task(name="archive_old_batches")
+def archive_old_batches_task():
+    """
+    Periodic Celery task to move completed batches past the retention
+    window to cold storage
+    """
+    db = SessionLocal()
+    try:
+        archived = archive_old_batches(db)
+        invalidate_batches(archived)
+        return {"archived": archived}
+    except Exception as e:
+        db.rollback()
+        return {"error": str(e)}
+    finally:
+        db.close()
@@ -0,0 +1,43 @@
+from app.celery_app import celery_app
+from app.core.database import SessionLocal
+from app.models.models import ReportBatch
+from app.services.analytics_export import export_batch
+
+
+@celery_app.task(name="export_batch_analytics")
+def export_batch_task(batch_id: int):
+    """
+    Celery task to materialize a finished batch into its Parquet partition
+    """
+    db = SessionLocal()
+    try:
+        rows = export_batch(db, batch_id)
+        return {"batch_id": batch_id, "rows": rows}
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="export_template_analytics")
+def export_template_task(template_id: int):
+    """
+    Celery task to (re)build the Parquet partitions of every completed
+    batch of a template, e.g. to backfill or after the template changed
+    """
+    db = SessionLocal()
+    try:
+        batch_ids = [
+            batch_id for (batch_id,) in db.query(ReportBatch.id).filter(
+                ReportBatch.template_id == template_id,
+                ReportBatch.status == "completed",
+                # Archived batches have no rows left to export
+                ReportBatch.archived_at.is_(None)
+            )
+        ]
+    finally:
+        db.close()
+
+    for batch_id in batch_ids:
+        export_batch_task.delay(batch_id)
+    return {"template_id": template_id, "batches": len(batch_ids)}
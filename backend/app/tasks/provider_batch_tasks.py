@@ -0,0 +1,143 @@
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_client import redis_client
+from app.models.models import ProviderBatch, ReportBatch, StructuredReport, Template
+from app.services.ai_service import ai_service
+from app.services.provider_batches import fetch_results, submit_reports
+from app.tasks.report_tasks import process_report_task, result_values, save_results
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.orm import Session
+from typing import Any, Iterator, Tuple
+
+# Longest a poll may run before another one can start
+POLL_LOCK_TTL_SECONDS = 3600
+
+
+@celery_app.task(name="submit_provider_batch")
+def submit_provider_batch_task(batch_id: int):
+    """
+    Celery task to submit a batch's reports to the provider's batch API.
+    Reports that weren't submitted (too long, or after a submission error)
+    are queued for individual processing.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            submitted = submit_reports(db, batch_id)
+            error = None
+        except Exception as e:
+            db.rollback()
+            submitted = None
+            error = str(e)
+
+        remaining = [
+            report_id for (report_id,) in db.query(StructuredReport.id).filter(
+                StructuredReport.batch_id == batch_id,
+                StructuredReport.status == "pending",
+                StructuredReport.duplicate_of_id.is_(None)
+            )
+        ]
+    finally:
+        db.close()
+
+    for report_id in remaining:
+        process_report_task.delay(report_id, batch_id)
+    return {"batch_id": batch_id, "submitted": submitted, "individual": len(remaining), "error": error}
+
+
+@celery_app.task(name="poll_provider_batches")
+def poll_provider_batches_task():
+    """
+    Periodic Celery task to collect the results of finished provider batches
+    """
+    lock = redis_client.lock("provider_batches:poll", timeout=POLL_LOCK_TTL_SECONDS)
+    if not lock.acquire(blocking=False):
+        return {"skipped": "previous poll still running"}
+
+    db = SessionLocal()
+    collected = []
+    try:
+        provider_batches = db.query(ProviderBatch).filter(
+            ProviderBatch.status == "submitted"
+        ).order_by(ProviderBatch.id).all()
+        for provider_batch in provider_batches:
+            results = fetch_results(provider_batch)
+            if results is None:
+                continue
+            collect_results(db, provider_batch, results)
+            collected.append(provider_batch.id)
+        return {"collected": collected}
+    except Exception as e:
+        db.rollback()
+        return {"collected": collected, "error": str(e)}
+    finally:
+        db.close()
+        lock.release()
+
+
+def collect_results(db: Session, provider_batch: ProviderBatch, results: Iterator[Tuple[int, Any]]):
+    """
+    Write a finished provider batch's results back in chunks of
+    AI_BATCH_WRITE_SIZE. Reports without a result are queued for individual
+    processing. Safe to rerun after a failure part way through.
+    """
+    batch = db.query(ReportBatch).filter(ReportBatch.id == provider_batch.batch_id).first()
+    template = db.query(Template).filter(Template.id == batch.template_id).first()
+
+    while True:
+        chunk = list(islice(results, settings.AI_BATCH_WRITE_SIZE))
+        if not chunk:
+            break
+
+        # Only reports still waiting on this provider batch are written
+        texts = dict(db.query(StructuredReport.id, StructuredReport.original_text).filter(
+            StructuredReport.batch_id == batch.id,
+            StructuredReport.provider_batch_id == provider_batch.id,
+            StructuredReport.status == "submitted",
+            StructuredReport.id.in_([report_id for report_id, _ in chunk])
+        ))
+
+        processed_at = datetime.utcnow()
+        values_list = []
+        for report_id, response in chunk:
+            if report_id not in texts:
+                continue
+            values = {"id": report_id, "batch_id": batch.id, "provider_batch_id": None}
+            try:
+                result = ai_service.parse_batch_response(
+                    provider_batch.provider,
+                    provider_batch.model,
+                    response,
+                    texts[report_id],
+                    template.structure
+                )
+                values.update(result_values(result))
+            except Exception as e:
+                values.update(status="failed", error_message=f"AI processing failed: {str(e)}")
+            values["processed_at"] = processed_at
+            values_list.append(values)
+
+        if values_list:
+            save_results(db, values_list)
+
+    # Errored, expired and canceled requests
+    leftover_filter = (
+        StructuredReport.batch_id == batch.id,
+        StructuredReport.provider_batch_id == provider_batch.id,
+        StructuredReport.status == "submitted"
+    )
+    leftover = [report_id for (report_id,) in db.query(StructuredReport.id).filter(*leftover_filter)]
+    if leftover:
+        db.query(StructuredReport).filter(*leftover_filter).update(
+            {"status": "pending", "provider_batch_id": None},
+            synchronize_session=False
+        )
+
+    provider_batch.status = "collected"
+    provider_batch.collected_at = datetime.utcnow()
+    db.commit()
+
+    for report_id in leftover:
+        process_report_task.delay(report_id, batch.id)
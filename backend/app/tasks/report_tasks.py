@@ -1,20 +1,91 @@
+from app.autoscaler import record_llm_latency
 from app.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
+from app.core import profiling
+from app.core.tracing import tracer
 from app.models.models import StructuredReport, ReportBatch, Template
 from app.services.ai_service import ai_service
-from sqlalchemy.orm import Session
+from app.services.batch_cache import invalidate_batches
+from app.tasks.export_tasks import export_batch_task
+from app.tasks.result_buffer import ResultBuffer
+from celery.concurrency import get_implementation
+from celery.signals import worker_init, worker_process_shutdown
+from celery.utils.log import get_logger
+from datetime import datetime
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session, undefer
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Set, Tuple
 import asyncio
 
+logger = get_logger(__name__)
+
+# Worker pools that run several tasks at once in one process, so that
+# their results can meet in the process's result buffer
+BUFFERED_POOLS = ("thread", "gevent", "eventlet")
+
+# Set at worker start-up from RESULT_BUFFER_ENABLED and the pool
+use_result_buffer = False
+
 
 @celery_app.task(name="process_report")
-def process_report_task(report_id: int):
+def process_report_task(report_id: int, batch_id: Optional[int] = None, profile: bool = False):
+    """
+    Celery task to process a single report asynchronously.
+    With CELERY_ACKS_LATE the task is acknowledged only after its result
+    is committed (or handed to save_report_result_task), so a worker crash
+    before then causes redelivery.
+    batch_id limits the report's lookup to its batch's partition.
+    Pass profile=True (or set PROFILING_EVERY_N_TASKS) to write a
+    sampling profile of the run to PROFILING_DIR.
+    """
+    if profiling.should_sample_task() or profile:
+        with profiling.profile(f"process_report-{report_id}"):
+            return process_report(report_id, batch_id)
+    return process_report(report_id, batch_id)
+
+
+@celery_app.task(name="save_report_result", bind=True, max_retries=settings.RESULT_SAVE_MAX_RETRIES)
+def save_report_result_task(self, values: Dict[str, Any]):
     """
-    Celery task to process a single report asynchronously
+    Celery task to commit a report result whose first commit failed.
+    Only the save is retried (with backoff), so the extraction isn't run
+    and billed again. Once the retries are used up the report is marked
+    failed.
     """
     db = SessionLocal()
+    try:
+        save_result(db, values)
+    except Exception as e:
+        db.rollback()
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+        logger.error("Giving up saving the result of report %s: %s", values["id"], e)
+        save_result(db, {
+            "id": values["id"],
+            "batch_id": values["batch_id"],
+            "status": "failed",
+            "error_message": f"Result could not be saved: {e}",
+            "processed_at": values["processed_at"]
+        })
+        return {"report_id": values["id"], "status": "failed"}
+    finally:
+        db.close()
+    return {"report_id": values["id"], "status": values["status"]}
+
+
+def process_report(report_id: int, batch_id: Optional[int] = None):
+    """Structure one report and save the result"""
+    db = SessionLocal()
     try:
         # Get the report
-        report = db.query(StructuredReport).filter(StructuredReport.id == report_id).first()
+        query = db.query(StructuredReport).options(
+            undefer(StructuredReport.original_text)
+        ).filter(StructuredReport.id == report_id)
+        if batch_id is not None:
+            query = query.filter(StructuredReport.batch_id == batch_id)
+        report = query.first()
         if not report:
             return {"error": "Report not found"}
         
@@ -30,6 +101,8 @@ def process_report_task(report_id: int):
             db.commit()
             return {"error": "Template not found"}
         
+        values = {"id": report.id, "batch_id": report.batch_id}
+        
         # Process with AI
         try:
             # Run async function in sync context
@@ -40,20 +113,23 @@ def process_report_task(report_id: int):
                 )
             )
             
-            report.structured_data = result["structured_data"]
-            report.confidence_score = result["confidence_score"]
-            report.status = "completed"
+            values.update(result_values(result))
+            if result.get("latency_ms") is not None:
+                record_llm_latency(result["latency_ms"])
             
         except Exception as e:
-            report.status = "failed"
-            report.error_message = str(e)
+            values.update(status="failed", error_message=str(e))
         
-        db.commit()
+        values["processed_at"] = datetime.utcnow()
         
-        # Update batch progress
-        update_batch_progress(db, report.batch_id)
+        try:
+            save_result(db, values)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Saving the result of report %s failed, retrying the save: %s", report_id, e)
+            save_report_result_task.apply_async((values,), countdown=1)
         
-        return {"report_id": report_id, "status": report.status}
+        return {"report_id": report_id, "status": values["status"]}
         
     except Exception as e:
         db.rollback()
@@ -62,11 +138,193 @@ def process_report_task(report_id: int):
         db.close()
 
 
-def update_batch_progress(db: Session, batch_id: int):
-    """Update batch completion status"""
-    batch = db.query(ReportBatch).filter(ReportBatch.id == batch_id).first()
-    if not batch:
+def save_result(db: Session, values: Dict[str, Any]):
+    """Commit one report result, through the result buffer if it is in use"""
+    if use_result_buffer:
+        # Blocks until the buffer containing this result has been committed
+        result_buffer.submit(values)
+    else:
+        save_results(db, [values])
+
+
+def result_values(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Column values of a completed report from an extraction result"""
+    values = dict(
+        structured_data=result["structured_data"],
+        confidence_score=result["confidence_score"],
+        extraction_tier=result.get("tier"),
+        provider=result.get("provider"),
+        model=result.get("model"),
+        escalated=result.get("escalated", False),
+        latency_ms=result.get("latency_ms"),
+        status="completed"
+    )
+    # Coalesced results were paid for by the report that computed them
+    if result.get("usage") and not result.get("coalesced"):
+        values.update(
+            llm_calls=result["usage"]["calls"],
+            input_tokens=result["usage"]["input_tokens"],
+            output_tokens=result["usage"]["output_tokens"],
+            cached_tokens=result["usage"]["cached_tokens"],
+            cost_usd=result["usage"]["cost_usd"]
+        )
+    return values
+
+
+def save_results(db: Session, results: List[Dict[str, Any]]):
+    """
+    Write completed/failed report results, propagate them to near-duplicates
+    and update progress of the affected batches in a single transaction.
+    """
+    with tracer.start_as_current_span("save_results", attributes={"reports.count": len(results)}):
+        update_reports(db, results)
+        
+        # Copy results to near-duplicates waiting on these reports, which
+        # may belong to other batches
+        requeue, duplicate_batch_ids = propagate_to_duplicates(db, results)
+        
+        # Update batch progress (in id order, as the batch rows are locked)
+        batch_ids = sorted({values["batch_id"] for values in results} | duplicate_batch_ids)
+        finished_batches = [
+            batch_id for batch_id in batch_ids
+            if update_batch_progress(db, batch_id)
+        ]
+        
+        db.commit()
+        invalidate_batches(batch_ids)
+        
+        for report_id, batch_id in requeue:
+            process_report_task.delay(report_id, batch_id)
+        
+        if settings.ANALYTICS_EXPORT_ENABLED:
+            for batch_id in finished_batches:
+                export_batch_task.delay(batch_id)
+
+
+def update_reports(db: Session, rows: List[Dict[str, Any]]):
+    """
+    Bulk-update reports from dicts with their id, batch_id and new values.
+    Reports are mapped by id alone, so the statement matches on both id and
+    batch_id to let Postgres update only the batch's partition. Rows are
+    updated in id order, the order in which uploads lock near-duplicate
+    representatives; consecutive rows setting the same columns share one
+    executemany.
+    """
+    table = StructuredReport.__table__
+    statement = update(table).where(
+        table.c.id == bindparam("report_id"),
+        table.c.batch_id == bindparam("report_batch_id")
+    )
+    rows = sorted(rows, key=lambda values: values["id"])
+    for _, group in groupby(rows, key=lambda values: sorted(values)):
+        db.execute(statement, [
+            {
+                **{key: value for key, value in values.items() if key not in ("id", "batch_id")},
+                "report_id": values["id"],
+                "report_batch_id": values["batch_id"]
+            }
+            for values in group
+        ])
+
+
+def flush_results(results: List[Dict[str, Any]]):
+    """Flush callback for the worker result buffer"""
+    db = SessionLocal()
+    try:
+        save_results(db, results)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+result_buffer = ResultBuffer(
+    flush_results,
+    max_size=settings.RESULT_BUFFER_SIZE,
+    max_delay_ms=settings.RESULT_BUFFER_FLUSH_MS
+)
+
+
+@worker_init.connect
+def configure_result_buffer(sender, **kwargs):
+    """
+    Use the result buffer only with pools that run concurrent tasks in one
+    process. Under prefork or solo a process runs one task at a time, so the
+    buffer would never hold more than one result and only delay its commit.
+    """
+    global use_result_buffer
+    if not settings.RESULT_BUFFER_ENABLED:
         return
+    pool = get_implementation(sender.pool_cls)
+    use_result_buffer = pool.__module__.rsplit(".", 1)[-1] in BUFFERED_POOLS
+    if not use_result_buffer:
+        logger.warning(
+            "RESULT_BUFFER_ENABLED has no effect with the %s pool; results are "
+            "committed per task. Use the threads or gevent pool to batch commits.",
+            pool.__module__.rsplit(".", 1)[-1]
+        )
+
+
+@worker_process_shutdown.connect
+def flush_result_buffer(**kwargs):
+    """Commit any buffered results before the worker process exits"""
+    result_buffer.flush()
+
+
+def propagate_to_duplicates(
+    db: Session,
+    results: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, int]], Set[int]]:
+    """
+    Copy representatives' results to their near-duplicate reports.
+    Returns the (id, batch_id) of duplicates of failed representatives, so they can be
+    queued individually once the transaction is committed, and the batches
+    of the duplicates that were completed.
+    """
+    by_id = {values["id"]: values for values in results}
+    duplicates = db.query(
+        StructuredReport.id, StructuredReport.batch_id, StructuredReport.duplicate_of_id
+    ).filter(
+        StructuredReport.duplicate_of_id.in_(by_id.keys()),
+        StructuredReport.status == "pending"
+    ).all()
+
+    updates = []
+    requeue = []
+    batch_ids = set()
+    for duplicate in duplicates:
+        representative = by_id[duplicate.duplicate_of_id]
+        values = {"id": duplicate.id, "batch_id": duplicate.batch_id}
+        if representative["status"] == "completed":
+            values.update(
+                structured_data=representative["structured_data"],
+                confidence_score=representative["confidence_score"],
+                is_propagated=True,
+                status="completed",
+                processed_at=representative["processed_at"]
+            )
+            batch_ids.add(duplicate.batch_id)
+        else:
+            values.update(duplicate_of_id=None)
+            requeue.append((duplicate.id, duplicate.batch_id))
+        updates.append(values)
+
+    update_reports(db, updates)
+    return requeue, batch_ids
+
+
+def update_batch_progress(db: Session, batch_id: int) -> bool:
+    """
+    Update batch completion status (committed by the caller).
+    Returns True if this update completed the batch.
+    The batch row is locked until the commit, so workers finishing reports
+    of the same batch count one after the other and each sees the results
+    committed before it.
+    """
+    batch = db.query(ReportBatch).filter(ReportBatch.id == batch_id).with_for_update().first()
+    if not batch:
+        return False
     
     # Count processed reports
     processed = db.query(StructuredReport).filter(
@@ -75,13 +333,41 @@ def update_batch_progress(db: Session, batch_id: int):
     ).count()
     
     batch.processed_reports = processed
+    batch.tier_stats = get_tier_stats(db, batch_id)
     
     # Update batch status
     if processed >= batch.total_reports:
+        just_completed = batch.status != "completed"
         batch.status = "completed"
-        from datetime import datetime
         batch.completed_at = datetime.utcnow()
-    else:
-        batch.status = "processing"
+        return just_completed
     
-    db.commit()
+    batch.status = "processing"
+    return False
+
+
+def get_tier_stats(db: Session, batch_id: int) -> dict:
+    """Aggregate per-tier report counts and LLM latency for a batch"""
+    rows = db.query(
+        StructuredReport.extraction_tier,
+        func.count(StructuredReport.id),
+        func.avg(StructuredReport.latency_ms),
+        func.max(StructuredReport.latency_ms)
+    ).filter(
+        StructuredReport.batch_id == batch_id,
+        StructuredReport.extraction_tier.isnot(None)
+    ).group_by(StructuredReport.extraction_tier).all()
+
+    escalated = db.query(StructuredReport).filter(
+        StructuredReport.batch_id == batch_id,
+        StructuredReport.escalated == True
+    ).count()
+
+    stats = {"escalated": escalated}
+    for tier, count, avg_latency, max_latency in rows:
+        stats[tier] = {
+            "count": count,
+            "avg_latency_ms": int(avg_latency) if avg_latency is not None else None,
+            "max_latency_ms": max_latency
+        }
+    return stats
@@ -0,0 +1,75 @@
+"""
+Write-behind buffer for report results in Celery workers.
+
+Tasks submit their result and block until the buffer is flushed, which
+happens when it holds max_size results or max_delay_ms after the first
+result arrived. Because the submitting task only returns (and, with
+acks_late, is only acknowledged) after the flush has committed, a worker
+crash never loses a result: unflushed tasks are simply redelivered.
+
+Results only batch up when several tasks run at once in the same process,
+i.e. with the threads or gevent worker pool.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+
+
+class ResultBuffer:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], None],
+        max_size: int,
+        max_delay_ms: int
+    ):
+        self.flush_fn = flush_fn
+        self.max_size = max_size
+        self.max_delay_ms = max_delay_ms
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._timer: Optional[threading.Timer] = None
+
+    def submit(self, values: Dict[str, Any]) -> None:
+        """Add a result and wait until it has been committed"""
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((values, future))
+            if len(self._pending) >= self.max_size:
+                entries = self._take()
+            else:
+                entries = []
+                if self._timer is None:
+                    self._timer = threading.Timer(self.max_delay_ms / 1000, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if entries:
+            self._write(entries)
+
+        # Re-raises the flush error, if any, in the submitting task
+        future.result()
+
+    def flush(self) -> None:
+        """Write out everything currently buffered"""
+        with self._lock:
+            entries = self._take()
+        if entries:
+            self._write(entries)
+
+    def _take(self) -> List[Tuple[Dict[str, Any], Future]]:
+        entries = self._pending
+        self._pending = []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return entries
+
+    def _write(self, entries: List[Tuple[Dict[str, Any], Future]]) -> None:
+        try:
+            self.flush_fn([values for values, _ in entries])
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+        else:
+            for _, future in entries:
+                future.set_result(None)
@@ -0,0 +1,165 @@
+"""
+Benchmark: storage size and read latency of compressed report text.
+
+Compares three ways of storing original_text:
+  raw    - uncompressed text (Postgres still applies pglz to TOASTed values)
+  zstd   - zstd frames without a dictionary
+  dict   - zstd frames with a dictionary trained on a sample of the reports,
+           as stored by the service
+
+For each, reports the compression ratio and per-report compress/decompress
+time, then loads the reports into a scratch table in the configured
+database and measures the table size and the latency of reading all texts
+and of single-report lookups. The scratch tables are dropped afterwards.
+
+Reports come from a JSON array (the upload format) or NDJSON file, or are
+generated from chest X-ray boilerplate:
+
+    uv run python benchmarks/text_storage.py --reports 20000
+    uv run python benchmarks/text_storage.py --input reports.json
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, List
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, insert, select, text
+
+from app.core.compression import CompressedText, compress_text, decompress_text, register_dictionary
+from app.core.config import settings
+from app.core.database import engine
+from app.services.text_dictionaries import train_dictionary
+
+INDICATIONS = ["Cough", "Shortness of breath", "Fever", "Chest pain", "Pre-operative evaluation", "Trauma"]
+FINDINGS = [
+    "The lungs are clear without focal consolidation, pleural effusion or pneumothorax.",
+    "Mild bibasilar atelectasis. No focal consolidation.",
+    "Patchy opacity in the right lower lobe, concerning for pneumonia.",
+    "Small left pleural effusion with adjacent compressive atelectasis.",
+    "Hyperinflated lungs consistent with chronic obstructive pulmonary disease.",
+]
+HEART = [
+    "The cardiomediastinal silhouette is within normal limits.",
+    "The heart is mildly enlarged. Mediastinal contours are unremarkable.",
+]
+IMPRESSIONS = [
+    "No acute cardiopulmonary process.",
+    "Right lower lobe pneumonia. Follow-up radiographs recommended after treatment.",
+    "Small left pleural effusion.",
+    "Cardiomegaly without pulmonary edema.",
+]
+
+
+def generate_reports(count: int) -> List[str]:
+    rng = random.Random(0)
+    return [
+        f"EXAMINATION: Chest radiograph, PA and lateral views.\n"
+        f"CLINICAL INDICATION: {rng.choice(INDICATIONS)}, {rng.randint(18, 95)}-year-old patient.\n"
+        f"COMPARISON: {rng.choice(['None.', f'Radiograph dated {rng.randint(1, 28)}/{rng.randint(1, 12)}/2024.'])}\n"
+        f"TECHNIQUE: Frontal and lateral views of the chest were obtained.\n"
+        f"FINDINGS:\n{rng.choice(FINDINGS)} {rng.choice(HEART)} "
+        f"No acute osseous abnormality. Accession {rng.randint(10**7, 10**8)}.\n"
+        f"IMPRESSION:\n{rng.choice(IMPRESSIONS)}"
+        for _ in range(count)
+    ]
+
+
+def load_reports(path: str) -> List[str]:
+    with open(path) as f:
+        content = f.read()
+    try:
+        records = json.loads(content)
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return [record["text"] if isinstance(record, dict) else record for record in records]
+
+
+def timed(fn: Callable, items: list) -> float:
+    """Mean microseconds per item"""
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def table_size(conn, name: str, column: str) -> int:
+    if engine.dialect.name == "postgresql":
+        return conn.execute(text(f"SELECT pg_total_relation_size('{name}')")).scalar()
+    # Other databases: stored bytes of the column
+    return conn.execute(text(f"SELECT SUM(LENGTH({column})) FROM {name}")).scalar()
+
+
+def measure_table(name: str, column_type, values: list, lookups: int) -> dict:
+    table = Table(
+        name, MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("original_text", column_type, nullable=False)
+    )
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+    try:
+        with engine.begin() as conn:
+            for start in range(0, len(values), 1000):
+                conn.execute(insert(table), [{"original_text": value} for value in values[start:start + 1000]])
+        with engine.connect() as conn:
+            size = table_size(conn, name, "original_text")
+
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            rows = conn.execute(select(table.c.original_text)).scalars().all()
+            scan_ms = (time.perf_counter() - start) * 1000
+            assert len(rows) == len(values)
+
+            ids = random.Random(1).sample(range(1, len(values) + 1), min(lookups, len(values)))
+            start = time.perf_counter()
+            for report_id in ids:
+                conn.execute(select(table.c.original_text).where(table.c.id == report_id)).scalar_one()
+            lookup_us = (time.perf_counter() - start) / len(ids) * 1e6
+        return {"size": size, "scan_ms": scan_ms, "lookup_us": lookup_us}
+    finally:
+        table.drop(engine)
+
+
+def main(args: argparse.Namespace):
+    reports = load_reports(args.input) if args.input else generate_reports(args.reports)
+    raw = [report.encode("utf-8") for report in reports]
+    raw_bytes = sum(len(data) for data in raw)
+    print(f"{len(reports)} reports, {raw_bytes / len(reports):.0f} bytes on average")
+
+    # Train on a sample, as the service does on a template's first upload
+    train_count = min(settings.REPORT_DICTIONARY_MAX_SAMPLES, max(len(reports) // 10, settings.REPORT_DICTIONARY_MIN_SAMPLES))
+    dictionary = train_dictionary(reports[:train_count])
+    if dictionary is None:
+        raise SystemExit("Dictionary training failed; use more reports")
+    register_dictionary(dictionary)
+    dict_id = dictionary.dict_id()
+
+    plain = [compress_text(report) for report in reports]
+    with_dict = [compress_text(report, dict_id) for report in reports]
+
+    print(f"\n{'codec':<6} {'ratio':>7} {'compress us':>12} {'decompress us':>14}")
+    print(f"{'raw':<6} {1.0:>7.2f} {'-':>12} {'-':>14}")
+    for name, frames, dict_for in (("zstd", plain, 0), ("dict", with_dict, dict_id)):
+        ratio = raw_bytes / sum(len(frame) for frame in frames)
+        compress_us = timed(lambda report: compress_text(report, dict_for), reports)
+        decompress_us = timed(decompress_text, frames)
+        print(f"{name:<6} {ratio:>7.2f} {compress_us:>12.1f} {decompress_us:>14.1f}")
+
+    print(f"\n{engine.dialect.name} table, {args.lookups} lookups")
+    print(f"{'codec':<6} {'size KiB':>10} {'scan ms':>9} {'lookup us':>10}")
+    for name, column_type, values in (
+        ("raw", Text, reports),
+        ("zstd", CompressedText, plain),
+        ("dict", CompressedText, with_dict),
+    ):
+        result = measure_table(f"bench_text_{name}", column_type, values, args.lookups)
+        print(f"{name:<6} {result['size'] / 1024:>10.0f} {result['scan_ms']:>9.1f} {result['lookup_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="JSON array or NDJSON file of reports")
+    parser.add_argument("--reports", type=int, default=10000, help="Generated reports if no input is given")
+    parser.add_argument("--lookups", type=int, default=1000, help="Single-report reads to time")
+    main(parser.parse_args())
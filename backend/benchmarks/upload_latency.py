@@ -0,0 +1,101 @@
+"""
+Load test: API latency while a large batch upload is in progress.
+
+Starts one large upload against a running backend and, while it is being
+ingested, repeatedly polls the batch and template listing endpoints from
+several concurrent clients. Reports latency percentiles for the polls made
+during the upload and for a baseline period with no upload, so the effect
+of the upload on other requests can be compared before and after changes
+to the request path.
+
+Usage (with `make start` running):
+    uv run python benchmarks/upload_latency.py --reports 20000 --pollers 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label: str, latencies: List[float]):
+    if not latencies:
+        print(f"{label}: no requests completed")
+        return
+    print(
+        f"{label}: n={len(latencies)} "
+        f"p50={percentile(latencies, 50):.1f}ms "
+        f"p95={percentile(latencies, 95):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms "
+        f"max={max(latencies):.1f}ms "
+        f"mean={statistics.mean(latencies):.1f}ms"
+    )
+
+
+async def poll(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    paths = ["/api/reports/batches", "/api/templates/", "/health"]
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(paths[i % len(paths)])
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+
+
+async def run_pollers(client: httpx.AsyncClient, pollers: int, stop: asyncio.Event) -> List[float]:
+    latencies: List[float] = []
+    await asyncio.gather(*(poll(client, stop, latencies) for _ in range(pollers)))
+    return latencies
+
+
+async def main(args: argparse.Namespace):
+    report = (
+        "CLINICAL INDICATION: Cough.\nTECHNIQUE: PA and lateral chest radiographs.\n"
+        "FINDINGS: The lungs are clear. The cardiac silhouette is normal in size.\n"
+        "IMPRESSION: No acute cardiopulmonary process. Study {n}."
+    )
+    payload = json.dumps([report.format(n=n) for n in range(args.reports)])
+
+    limits = httpx.Limits(max_connections=args.pollers + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=600, limits=limits) as client:
+        # Baseline: same polling load with no upload in flight
+        stop = asyncio.Event()
+        baseline_task = asyncio.create_task(run_pollers(client, args.pollers, stop))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        summarize("baseline", await baseline_task)
+
+        # Polling while the upload is being ingested
+        stop = asyncio.Event()
+        polling_task = asyncio.create_task(run_pollers(client, args.pollers, stop))
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/reports/batches",
+            data={"name": "load-test", "template_id": str(args.template_id)},
+            files=[("files", ("load_test.json", payload, "application/json"))],
+        )
+        upload_seconds = time.perf_counter() - start
+        stop.set()
+        response.raise_for_status()
+        print(f"upload: {args.reports} reports in {upload_seconds:.2f}s")
+        summarize("during upload", await polling_task)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--template-id", type=int, default=1)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--pollers", type=int, default=20)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+"""
+Benchmark: report throughput for different Celery worker configurations.
+
+For each configuration a worker is started with the mock AI provider
+(AI_PROVIDER=mock), which simulates LLM calls with log-normally distributed
+latency, a batch of reports is queued through process_report_task, and the
+time until the batch completes is measured. Requires the configured
+Postgres and Redis (e.g. run inside the backend container).
+
+Configurations are given as pool:concurrency:prefetch, optionally with
+":autoscale" to enable the queue-depth autoscaler (prefork only), e.g.:
+
+    uv run python benchmarks/worker_throughput.py --reports 400 \\
+        prefork:8:4 prefork:8:1 threads:32:1 prefork:16:1:autoscale
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from app.celery_app import celery_app
+from app.core.database import SessionLocal
+from app.models.models import ReportBatch, StructuredReport, Template
+from app.services.report_storage import ensure_partition
+from app.tasks.report_tasks import process_report_task
+from app.templates.default_templates import DEFAULT_TEMPLATES
+
+REPORT_TEXT = (
+    "CLINICAL INDICATION: Cough.\nTECHNIQUE: PA and lateral chest radiographs.\n"
+    "FINDINGS: The lungs are clear.\nIMPRESSION: No acute process. Study {n}."
+)
+
+
+def start_worker(pool: str, concurrency: int, prefetch: int, autoscale: bool, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        AI_PROVIDER="mock",
+        MOCK_LATENCY_MS=str(args.mock_latency_ms),
+        MOCK_LATENCY_SIGMA=str(args.mock_latency_sigma),
+        CELERY_WORKER_POOL=pool,
+        CELERY_WORKER_CONCURRENCY=str(concurrency),
+        CELERY_PREFETCH_MULTIPLIER=str(prefetch),
+        CELERY_AUTOSCALE_ENABLED=str(autoscale).lower(),
+        CELERY_AUTOSCALE_MIN="1",
+        CELERY_AUTOSCALE_MAX=str(concurrency),
+        CELERY_AUTOSCALE_TARGET_DRAIN_SECONDS=str(args.drain_seconds),
+        RESULT_BUFFER_ENABLED=str(args.result_buffer).lower(),
+    )
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "app.celery_worker"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(60):
+        if celery_app.control.ping(timeout=0.5):
+            return worker
+        time.sleep(0.5)
+    worker.terminate()
+    raise RuntimeError("Worker did not start")
+
+
+def get_template_id(db) -> int:
+    template = db.query(Template).first()
+    if not template:
+        template = Template(**DEFAULT_TEMPLATES[0])
+        db.add(template)
+        db.commit()
+    return template.id
+
+
+def run(config: str, args) -> float:
+    pool, concurrency, prefetch, *flags = config.split(":")
+    autoscale = "autoscale" in flags
+    celery_app.control.purge()
+
+    db = SessionLocal()
+    worker = start_worker(pool, int(concurrency), int(prefetch), autoscale, args)
+    try:
+        template_id = get_template_id(db)
+        batch = ReportBatch(
+            name=f"benchmark {config}",
+            template_id=template_id,
+            total_reports=args.reports,
+            status="pending",
+        )
+        db.add(batch)
+        db.commit()
+        ensure_partition(batch.id)
+        reports = [
+            StructuredReport(
+                batch_id=batch.id,
+                template_id=template_id,
+                original_text=REPORT_TEXT.format(n=n),
+                status="pending",
+            )
+            for n in range(args.reports)
+        ]
+        db.add_all(reports)
+        db.commit()
+
+        start = time.perf_counter()
+        for report in reports:
+            process_report_task.delay(report.id, batch.id)
+
+        while True:
+            db.expire_all()
+            batch = db.query(ReportBatch).filter(ReportBatch.id == batch.id).one()
+            if batch.status == "completed":
+                break
+            time.sleep(0.2)
+        return time.perf_counter() - start
+    finally:
+        worker.terminate()
+        worker.wait()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("configs", nargs="+")
+    parser.add_argument("--reports", type=int, default=400)
+    parser.add_argument("--mock-latency-ms", type=int, default=2000)
+    parser.add_argument("--mock-latency-sigma", type=float, default=0.8)
+    parser.add_argument("--drain-seconds", type=int, default=30)
+    parser.add_argument("--result-buffer", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'config':<28} {'seconds':>8} {'reports/s':>10}")
+    for config in args.configs:
+        elapsed = run(config, args)
+        print(f"{config:<28} {elapsed:>8.1f} {args.reports / elapsed:>10.2f}")
@@ -0,0 +1,299 @@
+"""
+Fake provider batch server
+Local stand-in for the Anthropic Message Batches and OpenAI Batch APIs, for
+testing batch mode without API keys or a 24h turnaround.
+
+Implements the endpoints the SDKs use to create, poll and read batches.
+Batches end --delay seconds after creation. Each request is answered with
+a schema-conforming extraction: every text field gets the report sentence
+that mentions the field's name, or null. A share of requests given by
+--error-rate fails, to exercise the fallback to individual processing.
+State is kept in memory.
+
+    uv run python fake_batch_server.py --port 8090 --delay 10
+    AI_BATCH_MODE_ENABLED=true AI_BATCH_BASE_URL=http://localhost:8090 ...
+"""
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI(title="Fake provider batch server")
+
+DELAY_SECONDS = 10.0
+ERROR_RATE = 0.0
+
+batches: Dict[str, Dict[str, Any]] = {}
+files: Dict[str, Dict[str, Any]] = {}
+
+
+def _report_text(prompt: str) -> str:
+    match = re.search(r"RADIOLOGY REPORT:\n(.*?)\n\nTEMPLATE STRUCTURE:", prompt, re.S)
+    return match.group(1) if match else prompt
+
+
+def _fill(schema: Dict[str, Any], defs: Dict[str, Any], sentences: List[str]) -> Any:
+    """Value for a JSON schema: objects are filled field by field"""
+    if "$ref" in schema:
+        return _fill(defs[schema["$ref"].split("/")[-1]], defs, sentences)
+    if "anyOf" in schema:
+        return _fill(next(option for option in schema["anyOf"] if option.get("type") != "null"), defs, sentences)
+    if schema.get("type") != "object":
+        return None
+    values = {}
+    for name, field_schema in schema.get("properties", {}).items():
+        value = _fill(field_schema, defs, sentences)
+        if value is None:
+            words = [word for word in name.lower().split("_") if len(word) > 2]
+            value = next((s for s in sentences if any(word in s.lower() for word in words)), None)
+        values[name] = value
+    return values
+
+
+def _extract(prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", _report_text(prompt)) if s.strip()]
+    return _fill(schema, schema.get("$defs", {}), sentences)
+
+
+def _ended(batch: Dict[str, Any]) -> bool:
+    return time.time() - batch["created"] >= DELAY_SECONDS
+
+
+def _failed() -> bool:
+    return random.random() < ERROR_RATE
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+# Anthropic Message Batches
+
+def _anthropic_result(request: Dict[str, Any]) -> Dict[str, Any]:
+    if _failed():
+        return {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "Fake error"}}}
+    params = request["params"]
+    prompt = params["messages"][0]["content"]
+    tool = params["tools"][0]
+    data = _extract(prompt, tool["input_schema"])
+    return {
+        "type": "succeeded",
+        "message": {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": params["model"],
+            "content": [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex}", "name": tool["name"], "input": data}],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": len(json.dumps(params)) // 4,
+                "output_tokens": len(json.dumps(data)) // 4,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0
+            }
+        }
+    }
+
+
+def _message_batch(batch: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    ended = _ended(batch)
+    counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+    if ended:
+        for item in batch["results"]:
+            counts[item["result"]["type"]] += 1
+    else:
+        counts["processing"] = len(batch["results"])
+    return {
+        "id": batch["id"],
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": counts,
+        "created_at": _iso(batch["created"]),
+        "expires_at": _iso(batch["created"] + 86400),
+        "ended_at": _iso(batch["created"] + DELAY_SECONDS) if ended else None,
+        "archived_at": None,
+        "cancel_initiated_at": None,
+        "results_url": f"{base_url}v1/messages/batches/{batch['id']}/results" if ended else None
+    }
+
+
+@app.post("/v1/messages/batches")
+async def create_message_batch(request: Request):
+    body = await request.json()
+    batch_id = f"msgbatch_{uuid.uuid4().hex}"
+    batches[batch_id] = {
+        "id": batch_id,
+        "created": time.time(),
+        "results": [
+            {"custom_id": item["custom_id"], "result": _anthropic_result(item)}
+            for item in body["requests"]
+        ]
+    }
+    return _message_batch(batches[batch_id], str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+def get_message_batch(batch_id: str, request: Request):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _message_batch(batches[batch_id], str(request.base_url))
+
+
+@app.get("/v1/messages/batches/{batch_id}/results")
+def get_message_batch_results(batch_id: str):
+    batch = batches.get(batch_id)
+    if not batch or not _ended(batch):
+        raise HTTPException(status_code=404, detail="Results not available")
+    return PlainTextResponse("\n".join(json.dumps(item) for item in batch["results"]) + "\n")
+
+
+# OpenAI Batch API
+
+def _openai_line(request: Dict[str, Any]) -> Dict[str, Any]:
+    if _failed():
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": request["custom_id"],
+            "response": None,
+            "error": {"code": "server_error", "message": "Fake error"}
+        }
+    body = request["body"]
+    prompt = body["messages"][-1]["content"]
+    data = _extract(prompt, body["response_format"]["json_schema"]["schema"])
+    content = json.dumps(data)
+    return {
+        "id": f"batch_req_{uuid.uuid4().hex}",
+        "custom_id": request["custom_id"],
+        "response": {
+            "status_code": 200,
+            "request_id": uuid.uuid4().hex,
+            "body": {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": len(json.dumps(body)) // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (len(json.dumps(body)) + len(content)) // 4
+                }
+            }
+        },
+        "error": None
+    }
+
+
+def _add_file(content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+    file_id = f"file-{uuid.uuid4().hex}"
+    files[file_id] = {
+        "content": content,
+        "object": {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+    }
+    return files[file_id]["object"]
+
+
+def _openai_batch(batch: Dict[str, Any]) -> Dict[str, Any]:
+    ended = _ended(batch)
+    if ended and batch["output_file_id"] is None:
+        outputs = [line for line in batch["lines"] if line["response"]]
+        errors = [line for line in batch["lines"] if not line["response"]]
+        batch["output_file_id"] = _add_file(
+            "".join(json.dumps(line) + "\n" for line in outputs).encode(), "output.jsonl", "batch_output"
+        )["id"]
+        if errors:
+            batch["error_file_id"] = _add_file(
+                "".join(json.dumps(line) + "\n" for line in errors).encode(), "errors.jsonl", "batch_output"
+            )["id"]
+    failed = sum(1 for line in batch["lines"] if not line["response"])
+    return {
+        "id": batch["id"],
+        "object": "batch",
+        "endpoint": batch["endpoint"],
+        "errors": None,
+        "input_file_id": batch["input_file_id"],
+        "completion_window": "24h",
+        "status": "completed" if ended else "in_progress",
+        "output_file_id": batch["output_file_id"],
+        "error_file_id": batch["error_file_id"],
+        "created_at": int(batch["created"]),
+        "in_progress_at": int(batch["created"]),
+        "completed_at": int(batch["created"] + DELAY_SECONDS) if ended else None,
+        "request_counts": {
+            "total": len(batch["lines"]),
+            "completed": len(batch["lines"]) - failed if ended else 0,
+            "failed": failed if ended else 0
+        }
+    }
+
+
+@app.post("/v1/files")
+async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    return _add_file(await file.read(), file.filename, purpose)
+
+
+@app.get("/v1/files/{file_id}/content")
+def get_file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail="File not found")
+    return PlainTextResponse(files[file_id]["content"].decode())
+
+
+@app.post("/v1/batches")
+async def create_openai_batch(request: Request):
+    body = await request.json()
+    if body["input_file_id"] not in files:
+        raise HTTPException(status_code=404, detail="Input file not found")
+    lines = files[body["input_file_id"]]["content"].decode().splitlines()
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    batches[batch_id] = {
+        "id": batch_id,
+        "created": time.time(),
+        "endpoint": body["endpoint"],
+        "input_file_id": body["input_file_id"],
+        "output_file_id": None,
+        "error_file_id": None,
+        "lines": [_openai_line(json.loads(line)) for line in lines if line.strip()]
+    }
+    return _openai_batch(batches[batch_id])
+
+
+@app.get("/v1/batches/{batch_id}")
+def get_openai_batch(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _openai_batch(batches[batch_id])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=10.0, help="Seconds until a batch ends")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    args = parser.parse_args()
+    DELAY_SECONDS = args.delay
+    ERROR_RATE = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port)
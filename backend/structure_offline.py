@@ -0,0 +1,232 @@
+"""
+Offline bulk structuring script
+Structures a file of reports without the API, Celery, Postgres or Redis.
+
+Reads a JSON array (the upload format) or NDJSON file of reports, where each
+report is a string or an object with "text" and an optional "id". Reports
+are extracted in chunks with the same AIService, templates and prompts as
+the service: chunks run in a pool of worker processes, and each process
+runs up to --concurrency extractions at a time. Results are appended to an
+NDJSON file or written as Parquet part files (one column per template field)
+and the ids of completed reports are recorded in <output>.checkpoint, so an
+interrupted run continues where it stopped when started again. Failed
+reports (e.g. rate limits or timeouts) are written to the output but not
+checkpointed, so running again retries them; a later row for an id
+supersedes earlier ones. A crash between writing a chunk and checkpointing
+it can repeat that chunk.
+
+    uv run python structure_offline.py reports.ndjson --template "Chest X-Ray" \\
+        --output results.ndjson --concurrency 16 --workers 4
+"""
+import os
+
+# No database or broker is used; these only satisfy the required settings
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://offline@localhost/offline")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("SECRET_KEY", "offline")
+os.environ.setdefault("COALESCE_ENABLED", "false")
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Set
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.ai_service import ai_service
+from app.services.analytics_export import field_value, get_template_columns
+from app.templates.default_templates import DEFAULT_TEMPLATES
+
+RESULT_COLUMNS = [
+    ("id", pa.string()),
+    ("status", pa.string()),
+    ("confidence_score", pa.int32()),
+    ("extraction_tier", pa.string()),
+    ("latency_ms", pa.int64()),
+    ("error_message", pa.string()),
+]
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield {"id", "text"} for every report; NDJSON files are streamed"""
+    with open(path, encoding="utf-8") as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == "[":
+            items = enumerate(json.load(f))
+        else:
+            items = (
+                (index, json.loads(line))
+                for index, line in enumerate(f)
+                if line.strip()
+            )
+
+        for index, item in items:
+            if isinstance(item, str):
+                item = {"text": item}
+            if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+                raise ValueError(f"Invalid report at index {index}: expected a string or an object with 'text'")
+            yield {"id": str(item.get("id", index)), "text": item["text"]}
+
+
+def load_template(template: str) -> Dict[str, Any]:
+    """Template structure from a JSON file, or a default template by name"""
+    if os.path.exists(template):
+        with open(template, encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("structure", data)
+
+    for template_data in DEFAULT_TEMPLATES:
+        if template_data["name"].lower() == template.lower():
+            return template_data["structure"]
+    names = ", ".join(template_data["name"] for template_data in DEFAULT_TEMPLATES)
+    raise SystemExit(f"Unknown template '{template}'. Use a JSON file or one of: {names}")
+
+
+async def structure_records(
+    records: List[Dict[str, Any]],
+    structure: Dict[str, Any],
+    concurrency: int
+) -> List[Dict[str, Any]]:
+    """Extract a chunk of reports with at most `concurrency` calls in flight"""
+    # Provider SDK calls run in threads; size the pool to the concurrency
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def structure_one(record: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await ai_service.structure_report(record["text"], structure)
+                return {
+                    "id": record["id"],
+                    "status": "completed",
+                    "structured_data": result["structured_data"],
+                    "confidence_score": result["confidence_score"],
+                    "extraction_tier": result.get("tier"),
+                    "latency_ms": result.get("latency_ms"),
+                    "error_message": None
+                }
+            except Exception as e:
+                return {"id": record["id"], "status": "failed", "structured_data": None, "error_message": str(e)}
+
+    return await asyncio.gather(*[structure_one(record) for record in records])
+
+
+def structure_chunk(records: List[Dict[str, Any]], structure: Dict[str, Any], concurrency: int) -> List[Dict[str, Any]]:
+    """Process-pool entry point"""
+    return asyncio.run(structure_records(records, structure, concurrency))
+
+
+class NdjsonOutput:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, results: List[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetOutput:
+    """One zstd Parquet part file per chunk, flattened like the analytics export"""
+
+    def __init__(self, path: str, structure: Dict[str, Any]):
+        self.path = path
+        self.columns = get_template_columns(structure)
+        self.schema = pa.schema(
+            [pa.field(name, type_) for name, type_ in RESULT_COLUMNS]
+            + [pa.field(column, pa.string()) for _, column in self.columns]
+        )
+        os.makedirs(path, exist_ok=True)
+        self.parts = len([name for name in os.listdir(path) if name.endswith(".parquet")])
+
+    def write(self, results: List[Dict[str, Any]]):
+        rows = [
+            {
+                **{name: result.get(name) for name, _ in RESULT_COLUMNS},
+                **{column: field_value(result["structured_data"], path) for path, column in self.columns}
+            }
+            for result in results
+        ]
+        part_path = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+        pq.write_table(pa.Table.from_pylist(rows, schema=self.schema), f"{part_path}.tmp", compression="zstd")
+        os.replace(f"{part_path}.tmp", part_path)
+        self.parts += 1
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def append_checkpoint(path: str, results: List[Dict[str, Any]]):
+    """Record the completed reports; failed ones are retried on the next run"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(f"{result['id']}\n" for result in results if result["status"] == "completed")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run(args):
+    structure = load_template(args.template)
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "ndjson")
+    output = ParquetOutput(args.output, structure) if output_format == "parquet" else NdjsonOutput(args.output)
+    checkpoint_path = f"{args.output.rstrip('/')}.checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"Resuming: {len(done)} reports already completed")
+
+    pending = (record for record in read_records(args.input) if record["id"] not in done)
+    chunks = iter(lambda: list(itertools.islice(pending, args.chunk_size)), [])
+
+    processed = failed = 0
+    start = time.perf_counter()
+
+    def save(results: List[Dict[str, Any]]):
+        nonlocal processed, failed
+        output.write(results)
+        append_checkpoint(checkpoint_path, results)
+        processed += len(results)
+        failed += sum(1 for result in results if result["status"] == "failed")
+        rate = processed / (time.perf_counter() - start)
+        print(f"Processed {processed} reports ({failed} failed), {rate:.1f} reports/s", flush=True)
+
+    if args.workers <= 1:
+        for chunk in chunks:
+            save(structure_chunk(chunk, structure, args.concurrency))
+    else:
+        with ProcessPoolExecutor(args.workers) as pool:
+            in_flight = set()
+            # Keep a bounded number of chunks queued so the input is streamed
+            for chunk in itertools.chain(chunks, [None]):
+                if chunk is not None:
+                    in_flight.add(pool.submit(structure_chunk, chunk, structure, args.concurrency))
+                while in_flight and (chunk is None or len(in_flight) >= args.workers * 2):
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        save(future.result())
+
+    print(f"Done: {processed} reports in {time.perf_counter() - start:.1f}s, output in {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON array or NDJSON file of reports")
+    parser.add_argument("--template", required=True, help="Default template name or template JSON file")
+    parser.add_argument("--output", required=True, help="NDJSON file, or directory for Parquet output")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], help="Defaults to parquet for *.parquet outputs")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent extractions per process")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Reports per chunk (and checkpoint)")
+    run(parser.parse_args())
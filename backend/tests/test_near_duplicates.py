@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from app.services.near_duplicates import content_key, find_near_duplicates, normalize_report_text
+
+WORDS = (
+    "lungs clear heart size normal mediastinum within limits opacity effusion "
+    "noted stable bones intact soft tissue unremarkable"
+).split()
+
+
+def long_report(body_seed: int, header: str, middle: str, impression: str) -> str:
+    rng = random.Random(body_seed)
+    body = " ".join(rng.choice(WORDS) for _ in range(300))
+    return f"{header}\nFINDINGS: {body}. {middle}\nIMPRESSION: {impression}"
+
+
+def grouped(a: str, b: str) -> bool:
+    return content_key(a) == content_key(b)
+
+
+def test_groups_reports_differing_only_in_dates_times_and_identifiers():
+    a = long_report(1, "CT CHEST 03/12/2024 08:15, Accession: A1234567", "No pneumothorax.", "No acute process.")
+    b = long_report(1, "CT CHEST 04/01/2024 14:30, Accession: A7654321", "No pneumothorax.", "No acute process.")
+    assert grouped(a, b)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("There is no pneumothorax.", "There is a pneumothorax."),
+    ("No pleural effusion.", "Pleural effusion."),
+])
+def test_negation_flip_is_not_grouped(first, second):
+    a = long_report(2, "CT CHEST", first, "See findings.")
+    b = long_report(2, "CT CHEST", second, "See findings.")
+    assert not grouped(a, b)
+
+
+def test_impression_negation_flip_is_not_grouped():
+    a = long_report(3, "CT CHEST", "Stable.", "No acute process.")
+    b = long_report(3, "CT CHEST", "Stable.", "Acute process.")
+    assert not grouped(a, b)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Nodule measures 3.5-4.0 cm.", "Nodule measures 7.5-8.0 cm."),
+    ("Lesion 1.2/1.5 cm.", "Lesion 2.2/2.5 cm."),
+    ("Nodules 4-6-8 mm.", "Nodules 5-7-9 mm."),
+])
+def test_measurement_ranges_are_not_masked(first, second):
+    a = long_report(4, "CT ABDOMEN", first, "Mass.")
+    b = long_report(4, "CT ABDOMEN", second, "Mass.")
+    assert not grouped(a, b)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Heparin 12000 units given.", "Heparin 25000 units given."),
+    ("Contrast 100 ml.", "Contrast 150 ml."),
+    ("Dilution 1:10.", "Dilution 1:20."),
+])
+def test_doses_are_not_masked(first, second):
+    a = long_report(5, "CT ANGIOGRAM", first, "Normal.")
+    b = long_report(5, "CT ANGIOGRAM", second, "Normal.")
+    assert not grouped(a, b)
+
+
+def test_reports_point_at_first_report_of_their_group():
+    assert find_near_duplicates(["a", "b", "a", "c", "b", "a"]) == [None, None, 0, None, 1, 0]
+
+
+def test_normalization_keeps_clinical_numbers():
+    normalized = normalize_report_text(
+        "Mass 3.5-4.0 cm on 03/12/2024 at 14:30. Accession: A12345678. Heparin 12000 units."
+    )
+    assert "3.5-4.0 cm" in normalized
+    assert "12000 units" in normalized
+    assert "<date>" in normalized and "<time>" in normalized and "accession: <id>" in normalized
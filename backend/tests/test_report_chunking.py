@@ -0,0 +1,34 @@
+import random
+
+from app.services.report_chunking import chunk_report
+
+WORDS = "lungs clear heart size normal opacity effusion stable nodule".split()
+
+
+def words(count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def test_short_preamble_shares_a_chunk_with_an_oversized_section():
+    text = "Clinical history: cough\nFINDINGS: " + words(1100)
+    chunks = chunk_report(text, 3000)
+    assert chunks[0].startswith("Clinical history: cough\nFINDINGS: ")
+    assert all(len(chunk) <= 3000 for chunk in chunks)
+    assert all(len(chunk) > 300 for chunk in chunks[:-1])
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_short_preamble_is_not_a_chunk_of_its_own():
+    text = "Clinical note:\nFINDINGS:\n" + "\n".join(words(20, seed) for seed in range(7))
+    # The findings section fits a chunk on its own, but not with the note
+    chunks = chunk_report(text, 960)
+    assert chunks[0].startswith("Clinical note:\nFINDINGS:\n") and len(chunks[0]) > 100
+    assert all(len(chunk) <= 960 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_sections_that_fit_are_not_split():
+    findings = "FINDINGS:\n" + words(200, 1)
+    impression = "IMPRESSION:\n" + words(200, 2)
+    assert chunk_report(f"{findings}\n{impression}", 2000) == [findings, impression]
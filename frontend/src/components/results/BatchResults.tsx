@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getBatch, getBatchReports, ReportBatch, StructuredReport } from '../../services/api';
+import { getBatch, getBatchReports, getReport, ReportBatch, StructuredReport } from '../../services/api';
 
 interface BatchResultsProps {
   batchId: number;
@@ -47,6 +47,21 @@ const BatchResults: React.FC<BatchResultsProps> = ({ batchId }) => {
     return () => clearInterval(interval);
   }, [batchId, batch?.status]);
 
+  // Report lists don't include the original text; load it for the selected report
+  const selectReport = async (report: StructuredReport) => {
+    setSelectedReport(report);
+    try {
+      const fullReport = await getReport(report.id);
+      setSelectedReport((current) => (current?.id === report.id ? fullReport : current));
+    } catch (error) {
+      // Reports of archived batches are only available through the batch
+      console.error('Error fetching report:', error);
+      setSelectedReport((current) =>
+        current?.id === report.id ? { ...report, original_text: '(original text not available)' } : current
+      );
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -155,7 +170,7 @@ const BatchResults: React.FC<BatchResultsProps> = ({ batchId }) => {
             {reports.map((report) => (
               <div
                 key={report.id}
-                onClick={() => setSelectedReport(report)}
+                onClick={() => selectReport(report)}
                 className={`p-4 cursor-pointer hover:bg-gray-50 transition-colors ${
                   selectedReport?.id === report.id ? 'bg-blue-50' : ''
                 }`}
@@ -197,7 +212,7 @@ const BatchResults: React.FC<BatchResultsProps> = ({ batchId }) => {
                 <div className="border-t pt-4">
                   <h4 className="font-medium mb-2">Original Text</h4>
                   <div className="bg-gray-50 p-4 rounded text-sm whitespace-pre-wrap">
-                    {selectedReport.original_text}
+                    {selectedReport.original_text ?? 'Loading...'}
                   </div>
                 </div>
               </div>
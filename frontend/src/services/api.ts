@@ -34,7 +34,8 @@ export interface StructuredReport {
   id: number;
   batch_id: number;
   template_id: number;
-  original_text: string;
+  original_text?: string;  // Only included by getReport
+  text_length?: number;
   structured_data: any;
   confidence_score?: number;
   status: string;